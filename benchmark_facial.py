@@ -0,0 +1,216 @@
+"""
+Facial pipeline throughput benchmark
+Replays a frame source through detect -> crop -> preprocess -> infer and
+reports frames/s, per-stage latency percentiles and peak RSS.
+
+Usage:
+    python benchmark_facial.py --source images/happy --frames 200
+    python benchmark_facial.py --source session_dir --no-track --json results.json
+    python benchmark_facial.py --compare-runtimes graph function --batch-size 1
+"""
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from src.emotion_detection.face_tracking import FaceTracker
+from src.emotion_detection.facial_emotion import FacialEmotionDetector
+from src.emotion_detection.frame_sources import ImageDirectorySource, open_frame_source
+
+STAGES = ['detect', 'crop', 'preprocess', 'infer', 'total']
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def summarize(timings):
+    """p50/p95/p99/mean in milliseconds for each stage"""
+    summary = {}
+    for stage in STAGES:
+        values = np.array(timings[stage]) * 1000.0
+        if len(values) == 0:
+            continue
+        summary[stage] = {
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'mean_ms': float(np.mean(values))
+        }
+    return summary
+
+
+def run_benchmark(detector, source, num_frames=200, track=None, detect_interval=10,
+                  downscale=4, warmup=5):
+    """
+    Run the facial pipeline serially over a frame source and time every stage
+    track=None tracks faces on videos, cameras and recorded sessions but not
+    on image directories, whose consecutive images are unrelated photos.
+    """
+    timings = {stage: [] for stage in STAGES}
+    tracker = FaceTracker(detector.classifier, detect_interval=detect_interval, downscale=downscale)
+    frames = 0
+    faces = 0
+    start = None
+
+    with open_frame_source(source, loop=True) as frame_source:
+        if track is None:
+            track = not isinstance(frame_source, ImageDirectorySource)
+        for index, im in enumerate(frame_source):
+            if frames >= num_frames:
+                break
+            measure = index >= warmup
+            if measure and start is None:
+                start = time.perf_counter()
+
+            t0 = time.perf_counter()
+            if track:
+                boxes = [box for _, box in tracker.update(im)]
+            else:
+                mini = cv2.resize(im, (int(im.shape[1]/downscale), int(im.shape[0]/downscale)))
+                boxes = [tuple(int(v) * downscale for v in f)
+                         for f in detector.classifier.detectMultiScale(mini)]
+            t1 = time.perf_counter()
+            crops = [im[y:y+h, x:x+w] for (x, y, w, h) in boxes]
+            t2 = time.perf_counter()
+            if crops:
+                batch = detector.preprocess_crops(crops)
+                t3 = time.perf_counter()
+                detector.infer_batch(batch)
+            else:
+                t3 = time.perf_counter()
+            t4 = time.perf_counter()
+
+            if not measure:
+                continue
+            frames += 1
+            faces += len(crops)
+            timings['detect'].append(t1 - t0)
+            timings['crop'].append(t2 - t1)
+            if crops:
+                timings['preprocess'].append(t3 - t2)
+                timings['infer'].append(t4 - t3)
+            timings['total'].append(t4 - t0)
+
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    return {
+        'frames': frames,
+        'faces': faces,
+        'seconds': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'tracking': track,
+        'detections_run': tracker.detections_run if track else frames,
+        'stages': summarize(timings),
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def measure_call_overhead(detector, batch_size=1, calls=100, warmup=10):
+    """Latency of infer_batch on a fixed preprocessed batch, isolating per-call runtime overhead"""
+    batch = np.zeros((batch_size, detector.input_height, detector.input_width, 3), dtype=np.float32)
+    for _ in range(warmup):
+        detector.infer_batch(batch)
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        detector.infer_batch(batch)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000.0
+    return {
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'mean_ms': float(np.mean(latencies))
+    }
+
+
+def compare_runtimes(runtimes, model_file, batch_size=1, calls=100, xla=False,
+                     tflite_file='retrained_graph_int8.tflite'):
+    """
+    Measure per-call inference overhead of several runtimes in one process
+    The graph and function runtimes load model_file (a frozen .pb), tflite
+    loads tflite_file (made by quantize_model.py).
+    """
+    print(f"\n📊 Per-call inference latency (batch size {batch_size}, {calls} calls)")
+    print("="*60)
+    results = {}
+    for runtime in runtimes:
+        detector = FacialEmotionDetector(model_file=tflite_file if runtime == 'tflite' else model_file,
+                                         runtime=runtime, cache_size=0,
+                                         function_batch_size=batch_size, xla=xla)
+        results[runtime] = measure_call_overhead(detector, batch_size, calls)
+        detector.close()
+        stats = results[runtime]
+        print(f"{runtime:10s} p50 {stats['p50_ms']:8.2f}ms  p95 {stats['p95_ms']:8.2f}ms  "
+              f"mean {stats['mean_ms']:8.2f}ms")
+    print("="*60)
+    return results
+
+
+def print_report(report):
+    print("\n📊 Facial Pipeline Benchmark")
+    print("="*60)
+    print(f"Frames: {report['frames']}  Faces: {report['faces']}  "
+          f"Haar runs: {report['detections_run']}  "
+          f"Tracking: {'on' if report['tracking'] else 'off'}")
+    print(f"Throughput: {report['fps']:.1f} frames/s")
+    print(f"{'stage':12s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'mean':>9s}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:12s} {stats['p50_ms']:8.2f}ms {stats['p95_ms']:8.2f}ms "
+              f"{stats['p99_ms']:8.2f}ms {stats['mean_ms']:8.2f}ms")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS: {report['peak_rss_mb']:.1f} MB")
+    print("="*60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the facial emotion pipeline")
+    parser.add_argument('--source', default='images/happy',
+                        help="camera index, video file, image directory or recorded session")
+    parser.add_argument('--frames', type=int, default=200, help="frames to measure")
+    parser.add_argument('--warmup', type=int, default=5, help="frames to run before measuring")
+    parser.add_argument('--track', dest='track', action='store_true', default=None,
+                        help="track faces between frames (default: on, except for image directories)")
+    parser.add_argument('--no-track', dest='track', action='store_false',
+                        help="run Haar detection on every frame")
+    parser.add_argument('--detect-interval', type=int, default=10)
+    parser.add_argument('--model', default='retrained_graph.pb',
+                        help="frozen graph for the graph and function runtimes")
+    parser.add_argument('--tflite-model', default='retrained_graph_int8.tflite',
+                        help="model for the tflite runtime (see quantize_model.py)")
+    parser.add_argument('--runtime', choices=['graph', 'function', 'tflite'], default='graph')
+    parser.add_argument('--xla', action='store_true', help="XLA-compile the 'function' runtime")
+    parser.add_argument('--compare-runtimes', nargs='+', choices=['graph', 'function', 'tflite'],
+                        help="only measure per-call inference overhead of these runtimes")
+    parser.add_argument('--batch-size', type=int, default=1, help="batch size for --compare-runtimes")
+    parser.add_argument('--json', help="also write the report to this file")
+    args = parser.parse_args()
+
+    if args.compare_runtimes:
+        report = compare_runtimes(args.compare_runtimes, args.model, args.batch_size, xla=args.xla,
+                                  tflite_file=args.tflite_model)
+    else:
+        model_file = args.tflite_model if args.runtime == 'tflite' else args.model
+        detector = FacialEmotionDetector(model_file=model_file, runtime=args.runtime, xla=args.xla)
+        report = run_benchmark(detector, args.source, num_frames=args.frames,
+                               track=args.track, detect_interval=args.detect_interval,
+                               warmup=args.warmup)
+        print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report saved to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
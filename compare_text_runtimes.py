@@ -0,0 +1,154 @@
+"""
+Float vs dynamically quantized text emotion model
+Runs the same texts through both runtimes of TextEmotionDetector and reports
+agreement on the mapped {angry, happy, sad, neutral} labels, latency and
+memory.
+
+Usage:
+    python compare_text_runtimes.py
+    python compare_text_runtimes.py --texts chat_log.txt --threads 4
+    python compare_text_runtimes.py --model ./models/distilroberta --offline
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import torch
+
+from src.emotion_detection.text_emotion import TEXT_MODEL, TextEmotionDetector
+
+SAMPLE_TEXTS = [
+    "I can't believe they cancelled the show, I'm furious",
+    "This is the best day of my life!",
+    "I miss her so much, everything feels empty",
+    "The meeting is at three in the afternoon",
+    "Why does this keep happening to me? I hate it",
+    "We won the match and everyone is celebrating",
+    "I'm not sure how I feel about the move",
+    "The rain hasn't stopped all week and I just want to stay in bed",
+    "Thanks, that works for me",
+    "Stop calling me, I told you I'm done",
+    "My grandmother passed away last night",
+    "Wow, I did not expect that gift, thank you so much!",
+]
+
+
+def current_rss_mb():
+    """Resident set size of this process, or None where /proc is not available"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def model_size_mb(classifier):
+    """Serialized size of the model weights"""
+    buffer = io.BytesIO()
+    torch.save(classifier.model.state_dict(), buffer)
+    return buffer.tell() / 1e6
+
+
+def load(runtime, model, threads, offline):
+    """Load a detector synchronously, returns (detector, load seconds, RSS delta in MB)"""
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    detector = TextEmotionDetector(background=False, cache_size=0, runtime=runtime, model=model,
+                                   num_threads=threads, local_files_only=offline)
+    seconds = time.perf_counter() - start
+    if not detector.model_loaded:
+        raise RuntimeError(f"{runtime} model failed to load: {detector.load_error}")
+    rss_after = current_rss_mb()
+    rss_delta = rss_after - rss_before if rss_before is not None else None
+    return detector, seconds, rss_delta
+
+
+def evaluate(detector, texts, batch_size, warmup=2):
+    """Return (mapped labels, per-text latencies in seconds, batched texts/s)"""
+    for text in texts[:warmup]:
+        detector.get_emotion_probabilities(text)
+
+    labels, latencies = [], []
+    for text in texts:
+        start = time.perf_counter()
+        probs = detector.get_emotion_probabilities(text)
+        latencies.append(time.perf_counter() - start)
+        labels.append(max(probs, key=probs.get))
+
+    detector.batch_size = batch_size
+    start = time.perf_counter()
+    detector.get_emotion_probabilities_batch(texts)
+    throughput = len(texts) / (time.perf_counter() - start)
+    return labels, np.array(latencies), throughput
+
+
+def compare(model, texts, threads=None, batch_size=8, offline=False, min_agreement=0.9):
+    """Print agreement, latency and memory of both runtimes, returns True if safe to use"""
+    results = {}
+    for runtime in ('pipeline', 'quantized'):
+        print(f"🔧 Loading {runtime} runtime...")
+        detector, load_seconds, rss_delta = load(runtime, model, threads, offline)
+        labels, latencies, throughput = evaluate(detector, texts, batch_size)
+        results[runtime] = {
+            'labels': labels,
+            'latencies': latencies,
+            'throughput': throughput,
+            'load_seconds': load_seconds,
+            'rss_delta': rss_delta,
+            'size': model_size_mb(detector.classifier)
+        }
+        del detector
+
+    float_run, quant_run = results['pipeline'], results['quantized']
+    agreement = np.mean([a == b for a, b in zip(float_run['labels'], quant_run['labels'])])
+
+    print("\n📊 Float vs Quantized (text)")
+    print("="*60)
+    print(f"Texts:           {len(texts)}")
+    print(f"Agreement:       {agreement:.2%}")
+    print(f"Latency p50:     float {np.percentile(float_run['latencies'], 50)*1000:.2f}ms   "
+          f"quantized {np.percentile(quant_run['latencies'], 50)*1000:.2f}ms")
+    print(f"Latency p95:     float {np.percentile(float_run['latencies'], 95)*1000:.2f}ms   "
+          f"quantized {np.percentile(quant_run['latencies'], 95)*1000:.2f}ms")
+    print(f"Batched ({batch_size}):     float {float_run['throughput']:.1f} texts/s   "
+          f"quantized {quant_run['throughput']:.1f} texts/s")
+    print(f"Load time:       float {float_run['load_seconds']:.1f}s   "
+          f"quantized {quant_run['load_seconds']:.1f}s")
+    print(f"Model size:      float {float_run['size']:.1f} MB   quantized {quant_run['size']:.1f} MB")
+    if float_run['rss_delta'] is not None:
+        # The float model is loaded first, so part of its delta is torch itself
+        print(f"RSS on load:     float +{float_run['rss_delta']:.0f} MB   "
+              f"quantized +{quant_run['rss_delta']:.0f} MB")
+    print("="*60)
+
+    safe = agreement >= min_agreement
+    if safe:
+        print(f"✅ Agreement at least {min_agreement:.0%}, quantized runtime is safe to use")
+    else:
+        print(f"⚠️  Agreement only {agreement:.2%}, keep the float runtime")
+    return safe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare float and quantized text emotion runtimes")
+    parser.add_argument('--model', default=TEXT_MODEL, help="hub id or local model directory")
+    parser.add_argument('--texts', help="file with one text per line (default: built-in samples)")
+    parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--offline', action='store_true', help="only use locally cached files")
+    parser.add_argument('--min-agreement', type=float, default=0.9)
+    args = parser.parse_args()
+
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        with open(args.texts, 'r') as f:
+            texts = [line.strip() for line in f if line.strip()]
+    compare(args.model, texts, args.threads, args.batch_size, args.offline, args.min_agreement)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,43 +1,210 @@
-import cv2
+"""
+Dataset face-cropping tool
+Crops faces out of the labelled images/<class>/ tree into a mirrored output tree
+
+Usage:
+    python face_crop.py --input images --output images_cropped --workers 4
+"""
+import argparse
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from src.emotion_detection.frame_sources import IMAGE_EXTENSIONS
+
+MANIFEST_NAME = '.face_crop_manifest.json'
+
+# Loaded once per worker process by init_worker
+cascade = None
+
+
+def init_worker(cascade_file):
+    """Load the Haar cascade once for this worker process"""
+    global cascade
+    cv2.setNumThreads(1)  # parallelism comes from the process pool
+    cascade = cv2.CascadeClassifier(cascade_file)
+
+
+def find_images(input_dir):
+    """Yield paths of all images under input_dir, relative to it"""
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, name), input_dir)
+
+
+def file_hash(path):
+    """SHA-1 of a file's content"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_up_to_date(current, entry, output_dir):
+    """True if the manifest entry still matches the source file and its crops exist"""
+    if not entry:
+        return False
+    if not all(os.path.exists(os.path.join(output_dir, p)) for p in entry['outputs']):
+        return False
+    if 'hash' in current:
+        return entry.get('hash') == current['hash']
+    return entry.get('mtime') == current['mtime'] and entry.get('size') == current['size']
+
 
-directory = "E:\Mudit_syncin_show\images"
+def remove_outputs(output_dir, entry):
+    """Delete the crops a manifest entry recorded, returns how many were removed"""
+    removed = 0
+    for rel in (entry or {}).get('outputs', []):
+        path = os.path.join(output_dir, rel)
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    return removed
 
-f_directory = "E:\Mudit_syncin_show\images1"
 
-def facecrop(image):
-    facedata = "haarcascade_frontalface_alt.xml"
-    cascade = cv2.CascadeClassifier(facedata)
-    img = cv2.imread(image)
+def facecrop(task):
+    """Detect faces in one image and write the crops, runs inside a worker"""
+    rel, input_dir, output_dir, max_side, check, entry = task
+    src = os.path.join(input_dir, rel)
+    result = {'rel': rel, 'status': 'cropped', 'outputs': [], 'error': None}
 
     try:
-        minisize = (img.shape[1],img.shape[0])
-        miniframe = cv2.resize(img, minisize)
+        stat = os.stat(src)
+        result['mtime'] = stat.st_mtime
+        result['size'] = stat.st_size
+        if check == 'hash':
+            result['hash'] = file_hash(src)
+        if is_up_to_date(result, entry, output_dir):
+            result['status'] = 'skipped'
+            result['outputs'] = entry['outputs']
+            return result
 
-        faces = cascade.detectMultiScale(miniframe)
+        # Crops from the previous run must not outlive a re-crop that finds fewer faces
+        remove_outputs(output_dir, entry)
 
-        for f in faces:
-            x, y, w, h = [ v for v in f ]
-            cv2.rectangle(img, (x,y), (x+w,y+h), (0,255,0), 2)
+        img = cv2.imread(src)
+        if img is None:
+            raise ValueError("could not decode image")
 
-            sub_face = img[y:y+h, x:x+w]
+        # Detect on a downscaled grayscale copy, crop from the full resolution image
+        scale = min(1.0, float(max_side) / max(img.shape[:2]))
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (int(img.shape[1] * scale), int(img.shape[0] * scale)),
+                              interpolation=cv2.INTER_AREA)
+        faces = cascade.detectMultiScale(gray)
 
-            f_name = image.split('/')
-            f_name = f_name[-1]
+        stem = os.path.splitext(rel)[0]
+        os.makedirs(os.path.join(output_dir, os.path.dirname(rel)), exist_ok=True)
+        for i, f in enumerate(faces):
+            x, y, w, h = [int(v / scale) for v in f]
+            out_rel = "%s_%d.jpg" % (stem, i)
+            if not cv2.imwrite(os.path.join(output_dir, out_rel), img[y:y+h, x:x+w]):
+                raise IOError("could not write %s" % out_rel)
+            result['outputs'].append(out_rel)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
 
-            cv2.imwrite(f_directory + f_name, sub_face)
-            print ("Writing: " + image)
+    return result
 
-    except:
-        pass
 
-if __name__ == '__main__':
-    images = os.listdir(directory)
-    i = 0
-    
-    for img in images:
-        file = directory + img
-        print (i)
-        facecrop(file)
-        i += 1
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            return json.load(f)
+    return {}
+
+
+def save_manifest(output_dir, manifest):
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def crop_dataset(input_dir='images', output_dir='images_cropped',
+                 cascade_file='haarcascade_frontalface_alt.xml', workers=None,
+                 max_side=640, check='mtime'):
+    """Crop every image under input_dir in a process pool, returns a summary dict"""
+    manifest = load_manifest(output_dir)
+    images = list(find_images(input_dir))
+
+    # Drop crops of source images that no longer exist
+    current = set(images)
+    removed = 0
+    for rel in [rel for rel in manifest if rel not in current]:
+        removed += remove_outputs(output_dir, manifest.pop(rel))
+    tasks = [(rel, input_dir, output_dir, max_side, check, manifest.get(rel)) for rel in images]
+
+    counts = {'cropped': 0, 'skipped': 0, 'failed': 0}
+    faces = 0
+    failures = []
+    start = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(cascade_file,)) as pool:
+        for i, result in enumerate(pool.map(facecrop, tasks, chunksize=8), 1):
+            counts[result['status']] += 1
+            if result['status'] == 'failed':
+                failures.append((result['rel'], result['error']))
+                manifest.pop(result['rel'], None)
+                continue
+            if result['status'] == 'cropped':
+                faces += len(result['outputs'])
+            manifest[result['rel']] = {k: result[k] for k in ('mtime', 'size', 'hash', 'outputs')
+                                       if k in result}
+            if i % 100 == 0:
+                print(f"   {i}/{len(tasks)} images")
 
+    save_manifest(output_dir, manifest)
+    elapsed = time.time() - start
+    processed = counts['cropped'] + counts['failed']
+    return {
+        'images': len(tasks),
+        'cropped': counts['cropped'],
+        'skipped': counts['skipped'],
+        'failed': counts['failed'],
+        'faces': faces,
+        'removed': removed,
+        'failures': failures,
+        'seconds': elapsed,
+        'images_per_second': processed / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crop faces from a labelled image tree")
+    parser.add_argument('--input', default='images', help="labelled image tree (images/<class>/)")
+    parser.add_argument('--output', default='images_cropped', help="mirrored output tree")
+    parser.add_argument('--cascade', default='haarcascade_frontalface_alt.xml')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--max-side', type=int, default=640,
+                        help="downscale images so their longest side is at most this before detection")
+    parser.add_argument('--check', choices=['mtime', 'hash'], default='mtime',
+                        help="how to decide whether an image's crops are up to date")
+    args = parser.parse_args()
+
+    print(f"✂️  Cropping faces from {args.input} into {args.output}...")
+    summary = crop_dataset(args.input, args.output, args.cascade, args.workers,
+                           args.max_side, args.check)
+
+    print(f"✅ {summary['cropped']} cropped, {summary['skipped']} up to date, "
+          f"{summary['failed']} failed, {summary['faces']} faces written")
+    if summary['removed']:
+        print(f"🗑️  {summary['removed']} crops of deleted images removed")
+    print(f"⏱️  {summary['seconds']:.1f}s ({summary['images_per_second']:.1f} images/s)")
+    for rel, error in summary['failures']:
+        print(f"⚠️  {rel}: {error}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,51 +1,38 @@
-import cv2
-import label_image, play_music_pygame
 import os
-from collections import Counter
+import sys
 
-size = 4
+import play_music_pygame
+from src.emotion_detection.emotion_voting import SequentialEmotionVoter
+from src.emotion_detection.facial_emotion import FacialEmotionDetector
+from src.emotion_detection.webcam_pipeline import WebcamEmotionPipeline
 
-classifier = cv2.CascadeClassifier('haarcascade_frontalface_alt.xml')
-webcam = cv2.VideoCapture(0)
+# Use the shared warm inference worker if one is running, else load the model here
+try:
+    detector = FacialEmotionDetector(runtime='remote')
+except OSError:
+    detector = FacialEmotionDetector()
 
-emotion_dict={'angry':'1', 'happy':'2', 'neutral or sad':'3'}
-predictions = []
+emotion_dict = detector.emotion_dict
+# Stop early once one emotion passes 90% posterior, never wait past 10 faces
+voter = SequentialEmotionVoter(len(detector.labels), confidence=0.9, min_frames=3, max_frames=10)
 
+# Capture, face detection and inference run on separate threads; full Haar
+# detection every 10 frames, template tracking in between (not across the
+# images of a directory). Camera index (default 0), video file, image
+# directory or recorded session.
+pipeline = WebcamEmotionPipeline(detector, source=sys.argv[1] if len(sys.argv) > 1 else 0,
+                                 downscale=4, window_name='Capture', detect_interval=10)
+predictions = pipeline.run(voter.max_frames, voter=voter)
 
-def calc_freq(L):
-    most_common, num_most_common = Counter(L).most_common(1)[0]  # 4, 6 times
-    return most_common
-
-inf_loop=True
-while inf_loop:
-    (rval, im) = webcam.read()
-    im=cv2.flip(im,1,0)
-    mini = cv2.resize(im, (int(im.shape[1]/size), int(im.shape[0]/size)))
-    faces = classifier.detectMultiScale(mini)
-    for f in faces:
-        (x, y, w, h) = [v * size for v in f]
-        cv2.rectangle(im, (x,y), (x+w,y+h), (0,255,0), 4)
-        sub_face = im[y:y+h, x:x+w]
-        FaceFileName = "test.jpg"
-        cv2.imwrite(FaceFileName, sub_face)
-        text = label_image.main(FaceFileName)
-        text = emotion_dict[text.title().lower()]
-        predictions.append(text)
-        if len(predictions)== 10:
-            os.system('clear')
-            print("\nDone")
-            print(emotion_dict)
-            print("predictions = ",predictions)
-            predicted=calc_freq(predictions)
-            print("predicted freq= ",predicted)
-            predicted_str=list(emotion_dict.keys())[list(emotion_dict.values()).index(predicted)]
-            print("I think you are ", predicted_str,"\n")
-            play_music_pygame.main(predicted)
-            inf_loop=False
-        font = cv2.FONT_HERSHEY_TRIPLEX
-        cv2.putText(im, text,(x+w,y), font, 1, (0,0,255), 1)
-    cv2.imshow('Capture', im)
-    key = cv2.waitKey(10)
-
-    if key == 27: #The Esc key
-        break
+# Not done when ESC was pressed or the source ran out before a decision
+if voter.done:
+    os.system('clear')
+    print("\nDone")
+    print(emotion_dict)
+    print("predictions = ",predictions)
+    index, confidence, frames_used = voter.decision()
+    predicted = emotion_dict[detector.labels[index].lower()]
+    print("predicted = ",predicted," confidence = %.2f after %d frames" % (confidence, frames_used))
+    predicted_str=list(emotion_dict.keys())[list(emotion_dict.values()).index(predicted)]
+    print("I think you are ", predicted_str,"\n")
+    play_music_pygame.main(predicted)
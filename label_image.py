@@ -2,13 +2,12 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import time
-
+import cv2
 import numpy as np
 import tensorflow as tf
 
-# Disable TensorFlow 2.x behavior for compatibility
-tf.compat.v1.disable_eager_execution()
+# Everything here is built inside explicit tf.Graph objects and run through
+# tf.compat.v1.Session, so eager execution can stay enabled for other TF users.
 
 def load_graph(model_file):
   graph = tf.Graph()
@@ -21,29 +20,47 @@ def load_graph(model_file):
 
 def read_tensor_from_image_file(file_name, input_height=299, input_width=299,
 				input_mean=0, input_std=255):
-  input_name = "file_reader"
-  output_name = "normalized"
-  file_reader = tf.compat.v1.read_file(file_name, input_name)
-  if file_name.endswith(".png"):
-    image_reader = tf.image.decode_png(file_reader, channels = 3,
-                                       name='png_reader')
-  elif file_name.endswith(".gif"):
-    image_reader = tf.squeeze(tf.image.decode_gif(file_reader,
-                                                  name='gif_reader'))
-  elif file_name.endswith(".bmp"):
-    image_reader = tf.image.decode_bmp(file_reader, name='bmp_reader')
-  else:
-    image_reader = tf.image.decode_jpeg(file_reader, channels = 3,
-                                        name='jpeg_reader')
-  float_caster = tf.cast(image_reader, tf.float32)
-  dims_expander = tf.expand_dims(float_caster, 0);
-  resized = tf.compat.v1.image.resize_bilinear(dims_expander, [input_height, input_width])
-  normalized = tf.divide(tf.subtract(resized, [input_mean]), [input_std])
-  sess = tf.compat.v1.Session()
-  result = sess.run(normalized)
+  graph = tf.Graph()
+  with graph.as_default():
+    input_name = "file_reader"
+    output_name = "normalized"
+    file_reader = tf.compat.v1.read_file(file_name, input_name)
+    if file_name.endswith(".png"):
+      image_reader = tf.image.decode_png(file_reader, channels = 3,
+                                         name='png_reader')
+    elif file_name.endswith(".gif"):
+      image_reader = tf.squeeze(tf.image.decode_gif(file_reader,
+                                                    name='gif_reader'))
+    elif file_name.endswith(".bmp"):
+      image_reader = tf.image.decode_bmp(file_reader, name='bmp_reader')
+    else:
+      image_reader = tf.image.decode_jpeg(file_reader, channels = 3,
+                                          name='jpeg_reader')
+    float_caster = tf.cast(image_reader, tf.float32)
+    dims_expander = tf.expand_dims(float_caster, 0);
+    resized = tf.compat.v1.image.resize_bilinear(dims_expander, [input_height, input_width])
+    normalized = tf.divide(tf.subtract(resized, [input_mean]), [input_std])
+    with tf.compat.v1.Session(graph=graph) as sess:
+      result = sess.run(normalized)
 
   return result
 
+_input_buffer = None
+
+def read_tensor_from_array(image, input_height=299, input_width=299,
+				input_mean=0, input_std=255):
+  """Resize and normalize a BGR NumPy crop into a reused float32 input buffer"""
+  global _input_buffer
+  shape = (1, input_height, input_width, 3)
+  if _input_buffer is None or _input_buffer.shape != shape:
+    _input_buffer = np.empty(shape, dtype=np.float32)
+  resized = cv2.resize(image, (input_width, input_height), interpolation=cv2.INTER_LINEAR)
+  # OpenCV crops are BGR, the model expects RGB like decode_jpeg produces
+  _input_buffer[0] = resized[:, :, ::-1]
+  np.subtract(_input_buffer, input_mean, out=_input_buffer)
+  np.divide(_input_buffer, input_std, out=_input_buffer)
+  return _input_buffer
+
 def load_labels(label_file):
   label = []
   proto_as_ascii_lines = tf.io.gfile.GFile(label_file).readlines()
@@ -51,35 +68,47 @@ def load_labels(label_file):
     label.append(l.rstrip())
   return label
 
-def main(img):
+_model = None
+
+def load_model(model_file="retrained_graph.pb", label_file="retrained_labels.txt",
+               input_layer="input", output_layer="final_result"):
+  """Load the graph, one session and the labels once; later calls reuse them"""
+  global _model
+  if _model is None:
+    graph = load_graph(model_file)
+    input_operation = graph.get_operation_by_name("import/" + input_layer)
+    output_operation = graph.get_operation_by_name("import/" + output_layer)
+    _model = {
+      'session': tf.compat.v1.Session(graph=graph),
+      'input': input_operation.outputs[0],
+      'output': output_operation.outputs[0],
+      'labels': load_labels(label_file),
+    }
+  return _model
+
+def classify(img):
+  """Return (labels, softmax vector) for a face crop or image file"""
   file_name = img
-  model_file = "retrained_graph.pb"
-  label_file = "retrained_labels.txt"
   input_height = 224
   input_width = 224
   input_mean = 128
   input_std = 128
-  input_layer = "input"
-  output_layer = "final_result"
-
-  graph = load_graph(model_file)
-  t = read_tensor_from_image_file(file_name,input_height=input_height,input_width=input_width,input_mean=input_mean,input_std=input_std)
-
-  input_name = "import/" + input_layer
-  output_name = "import/" + output_layer
-  input_operation = graph.get_operation_by_name(input_name);
-  output_operation = graph.get_operation_by_name(output_name);
 
+  model = load_model()
+  if isinstance(img, np.ndarray):
+    # In-memory face crop, no JPEG round-trip through disk
+    t = read_tensor_from_array(img,input_height=input_height,input_width=input_width,input_mean=input_mean,input_std=input_std)
+  else:
+    t = read_tensor_from_image_file(file_name,input_height=input_height,input_width=input_width,input_mean=input_mean,input_std=input_std)
 
-  with tf.compat.v1.Session(graph=graph) as sess:
-    start = time.time()
-    results = sess.run(output_operation.outputs[0],
-                      {input_operation.outputs[0]: t})
-    end=time.time()
+  results = model['session'].run(model['output'], {model['input']: t})
   results = np.squeeze(results)
+  return model['labels'], results
+
+def main(img):
+  labels, results = classify(img)
 
   top_k = results.argsort()[-5:][::-1]
-  labels = load_labels(label_file)
 
   for i in top_k:
     return labels[i]
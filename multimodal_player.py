@@ -12,22 +12,66 @@ from src.emotion_detection.facial_emotion import FacialEmotionDetector
 from src.emotion_detection.audio_emotion import AudioEmotionDetector
 from src.emotion_detection.text_emotion import TextEmotionDetector
 from src.fusion.multimodal_fusion import MultimodalFusion
+from src.fusion.fusion_coordinator import FusionCoordinator
+from src.fusion.temporal_fusion import TemporalFusion
 from src.music_analysis.music_emotion_recognition import MusicEmotionAnalyzer
 from src.recommendation.recommendation_engine import MusicRecommendationEngine
 import pygame
+import queue
+import select
+import threading
 import time
 
+
+def read_line(prompt, timeout, stop=None):
+    """
+    input() that gives up after timeout seconds or once the stop event is
+    set, returns the stripped line or None. Where stdin cannot be polled
+    (Windows) it blocks like input().
+    """
+    print(prompt, end='', flush=True)
+    if os.name == 'nt':
+        line = sys.stdin.readline()
+        return line.strip() if line else None
+    deadline = time.monotonic() + timeout
+    while stop is None or not stop.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        ready, _, _ = select.select([sys.stdin], [], [], min(remaining, 0.2))
+        if ready:
+            return sys.stdin.readline().strip()
+    print()
+    return None
+
+
 class MultimodalMusicPlayer:
-    def __init__(self):
+    def __init__(self, fusion_deadline=20.0, follow_mood=False, mood_half_life=15.0,
+                 mood_seed_weight=None, mood_min_dwell=30.0, mood_hop=2.0):
         print("🎵 Initializing Multimodal Music Player...")
         
         # Initialize all detectors
-        self.facial_detector = FacialEmotionDetector()
+        self.facial_detector = self._create_facial_detector()
         self.audio_detector = AudioEmotionDetector()
         self.text_detector = TextEmotionDetector()
         
         # Initialize fusion
         self.fusion = MultimodalFusion(fusion_method='attention')
+        # Seconds from the start of detection until fusion runs with what has arrived
+        self.fusion_deadline = fusion_deadline
+        # Keep listening during playback and switch songs when the mood changes
+        self.follow_mood = follow_mood
+        self.mood_half_life = mood_half_life
+        # Seconds between microphone estimates during playback, evidence weight of
+        # the detected emotion (default: as many estimates as fit in one half-life,
+        # each weighted at most 1) and seconds a song plays before switching
+        self.mood_hop = mood_hop
+        self.mood_seed_weight = mood_seed_weight if mood_seed_weight is not None \
+            else mood_half_life / mood_hop
+        self.mood_min_dwell = mood_min_dwell
+        self.mood = None
+        self._listener = None
+        self._stop_listening = threading.Event()
         
         # Initialize music analyzer
         self.music_analyzer = MusicEmotionAnalyzer()
@@ -40,6 +84,15 @@ class MultimodalMusicPlayer:
         
         print("✅ All systems ready!\n")
         
+    def _create_facial_detector(self):
+        """Use the shared inference worker when it is running, else load the model locally"""
+        try:
+            detector = FacialEmotionDetector(runtime='remote')
+            print("   📡 Using shared facial inference worker")
+            return detector
+        except OSError:
+            return FacialEmotionDetector()
+            
     def detect_emotions(self, use_facial=True, use_audio=True, use_text=True):
         """Detect emotions from all available modalities"""
         facial_probs = None
@@ -55,14 +108,7 @@ class MultimodalMusicPlayer:
             print("\n📹 Starting facial emotion detection...")
             print("   Look at the camera. Press ESC to finish.")
             emotion_code = self.facial_detector.detect_from_webcam(num_predictions=10)
-            
-            # Convert to probabilities
-            facial_probs = {
-                'angry': 0.9 if emotion_code == '1' else 0.05,
-                'happy': 0.9 if emotion_code == '2' else 0.05,
-                'neutral': 0.8 if emotion_code == '3' else 0.1,
-                'sad': 0.1
-            }
+            facial_probs = self._facial_probs(emotion_code)
             print(f"   ✓ Facial: {max(facial_probs, key=facial_probs.get)}")
             
         # Audio emotion detection
@@ -81,6 +127,8 @@ class MultimodalMusicPlayer:
             print("   (Press Enter to skip)")
             text_input = input("   Your text: ").strip()
             if text_input:
+                if not self.text_detector.is_ready:
+                    print("   ⏳ Text model still loading, using keyword analysis")
                 emotion, text_probs = self.text_detector.detect_from_input(text_input)
                 print(f"   ✓ Text: {emotion}")
             else:
@@ -89,11 +137,85 @@ class MultimodalMusicPlayer:
                 
         return facial_probs, audio_probs, text_probs
         
+    def _facial_probs(self, emotion_code):
+        """Convert a facial emotion code to probabilities"""
+        return {
+            'angry': 0.9 if emotion_code == '1' else 0.05,
+            'happy': 0.9 if emotion_code == '2' else 0.05,
+            'neutral': 0.8 if emotion_code == '3' else 0.1,
+            'sad': 0.1
+        }
+        
+    def detect_and_fuse(self, use_facial=True, use_audio=True, use_text=True):
+        """
+        Detect emotions concurrently and fuse whatever has arrived by the
+        deadline (or earlier, once the fused result is confident enough)
+        The text prompt and the microphone are closed as soon as fusion has
+        decided, since the song is chosen from that decision.
+        """
+        modalities = [m for m, used in (('facial', use_facial), ('audio', use_audio),
+                                        ('text', use_text)) if used]
+        coordinator = FusionCoordinator(self.fusion, modalities=modalities,
+                                        deadline=self.fusion_deadline)
+        decided = threading.Event()
+        
+        print("\n" + "="*60)
+        print("🎭 MULTIMODAL EMOTION DETECTION")
+        print("="*60)
+        
+        # Text can be typed from the start; the read gives up at the deadline
+        if use_text:
+            print(f"\n💬 Text emotion analysis (type within {self.fusion_deadline:.0f}s, "
+                  "press Enter to skip):")
+            if not self.text_detector.is_ready:
+                print("   ⏳ Text model still loading, using keyword analysis")
+            def read_text():
+                text_input = read_line("   Your text: ", self.fusion_deadline - coordinator.elapsed(),
+                                       stop=decided)
+                if not text_input:
+                    return None
+                return self.text_detector.get_emotion_probabilities(text_input)
+            coordinator.run('text', read_text)
+            
+        # The microphone listens while the webcam runs
+        if use_audio:
+            print("\n🎤 Listening in the background...")
+            coordinator.run('audio', lambda: self.audio_detector.detect_streaming(
+                stop_event=decided)[1])
+            
+        # The webcam window must stay on the main thread; it is stopped at the
+        # deadline and the predictions collected so far are voted on
+        if use_facial:
+            print("\n📹 Starting facial emotion detection...")
+            print("   Look at the camera. Press ESC to finish.")
+            try:
+                emotion_code = self.facial_detector.detect_from_webcam(
+                    num_predictions=10,
+                    timeout=max(0.0, self.fusion_deadline - coordinator.elapsed()))
+                if self.facial_detector.predictions:
+                    coordinator.publish('facial', self._facial_probs(emotion_code))
+                else:
+                    print("   ⊗ No face detected")
+                    coordinator.publish('facial', None)
+            except Exception as e:
+                print(f"   ⚠️  Facial detection skipped: {e}")
+                coordinator.publish('facial', None)
+                
+        fused_probs, used = coordinator.wait()
+        decided.set()
+        arrivals = coordinator.arrivals()
+        print(f"\n⏱️  Fused after {coordinator.decided_at:.1f}s using: " +
+              (", ".join(f"{m} ({arrivals[m]:.1f}s)" for m in used) or "no modality"))
+        return fused_probs
+        
     def fuse_and_recommend(self, facial_probs, audio_probs, text_probs):
         """Fuse emotions and recommend music"""
         # Fuse emotions
         fused_probs = self.fusion.fuse_emotions(facial_probs, audio_probs, text_probs)
+        return self.recommend(fused_probs)
         
+    def recommend(self, fused_probs):
+        """Display fused emotions and recommend music"""
         # Display results
         detected_emotion = self.fusion.print_fusion_results(fused_probs)
         
@@ -109,8 +231,62 @@ class MultimodalMusicPlayer:
         
         return detected_emotion, song
         
-    def play_music(self, song_name):
-        """Play the recommended song"""
+    def start_mood_tracking(self, fused_probs):
+        """
+        Stream microphone estimates into a time-decayed fusion state seeded
+        with the detected emotion; returns a queue of mood change events
+        The microphone also hears the music, so estimates are taken only
+        every mood_hop seconds, the detected emotion is seeded with as much
+        weight as the microphone can add in one half-life, and a song plays
+        at least mood_min_dwell seconds before it is switched.
+        """
+        changes = queue.Queue()
+        self.mood = TemporalFusion(self.fusion, half_life=self.mood_half_life,
+                                   min_dwell=self.mood_min_dwell, on_change=changes.put)
+        self.mood.seed(fused_probs, self.mood_seed_weight)
+        self._stop_listening.clear()
+        
+        def listen():
+            try:
+                stream = self.audio_detector.stream_emotions(hop=self.mood_hop,
+                                                             stop_event=self._stop_listening)
+                for _, probs in stream:
+                    self.mood.observe('audio', probs)
+            except Exception as e:
+                print(f"⚠️  Mood tracking stopped: {e}")
+                
+        self._listener = threading.Thread(target=listen, daemon=True)
+        self._listener.start()
+        print("👂 Following your mood while the music plays")
+        return changes
+        
+    def stop_mood_tracking(self):
+        """Stop listening and wait for the microphone stream to close"""
+        self._stop_listening.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5.0)
+            self._listener = None
+        
+    def _switch_song(self, mood_changes):
+        """Play a new recommendation if the mood changed, returns its name or None"""
+        event = None
+        while not mood_changes.empty():
+            event = mood_changes.get_nowait()  # only the latest change matters
+        if event is None:
+            return None
+        print(f"\n🔀 Mood changed: {event['previous']} → {event['emotion']} "
+              f"({event['confidence']:.0%})")
+        song_name = self.recommender.recommend_song(event['emotion'])
+        song_path = f'songs/{song_name}.mp3' if song_name else None
+        if not song_path or not os.path.exists(song_path):
+            return None
+        pygame.mixer.music.load(song_path)
+        pygame.mixer.music.play()
+        print(f"🎵 Now Playing: {song_name}")
+        return song_name
+        
+    def play_music(self, song_name, mood_changes=None):
+        """Play the recommended song, switching songs on mood change events if given"""
         if not song_name:
             print("⚠️  No song available")
             return
@@ -140,6 +316,12 @@ class MultimodalMusicPlayer:
             paused = False
             
             while running and pygame.mixer.music.get_busy():
+                if mood_changes is not None and not paused:
+                    new_song = self._switch_song(mood_changes)
+                    if new_song:
+                        song_name = new_song
+                        pygame.display.set_caption(f"Playing: {song_name}")
+                        
                 for event in pygame.event.get():
                     if event.type == pygame.QUIT:
                         running = False
@@ -193,19 +375,21 @@ class MultimodalMusicPlayer:
         
         input("Press Enter to start...")
         
-        # Detect emotions from all modalities
-        facial_probs, audio_probs, text_probs = self.detect_emotions(
+        # Detect emotions from all modalities and fuse what arrives in time
+        fused_probs = self.detect_and_fuse(
             use_facial=True,
             use_audio=True,
             use_text=True
         )
         
-        # Fuse and get recommendation
-        detected_emotion, song = self.fuse_and_recommend(facial_probs, audio_probs, text_probs)
+        # Get recommendation
+        detected_emotion, song = self.recommend(fused_probs)
         
         # Play music
         if song:
-            self.play_music(song)
+            mood_changes = self.start_mood_tracking(fused_probs) if self.follow_mood else None
+            self.play_music(song, mood_changes)
+            self.stop_mood_tracking()
         else:
             print("⚠️  Could not find a suitable song")
             
@@ -213,7 +397,7 @@ class MultimodalMusicPlayer:
 
 def main():
     try:
-        player = MultimodalMusicPlayer()
+        player = MultimodalMusicPlayer(follow_mood='--follow-mood' in sys.argv)
         player.run()
     except KeyboardInterrupt:
         print("\n\n👋 Goodbye!")
@@ -0,0 +1,162 @@
+"""
+Post-training quantization of the retrained facial emotion model
+Converts retrained_graph.pb to an int8 (or float16) TensorFlow Lite model,
+calibrated on a sample of images/, and compares it with the float model on a
+held-out split.
+
+Usage:
+    python quantize_model.py --mode int8
+    python quantize_model.py --mode float16 --output retrained_graph_fp16.tflite
+    python quantize_model.py --compare-only --output retrained_graph_int8.tflite
+"""
+import argparse
+import os
+import random
+import time
+
+import cv2
+import numpy as np
+import tensorflow as tf
+
+from src.emotion_detection.facial_emotion import FacialEmotionDetector
+from src.emotion_detection.frame_sources import IMAGE_EXTENSIONS
+
+
+def split_dataset(image_dir, labels, holdout=0.2, seed=0):
+    """Stratified split of images/<label>/ into (calibration, held-out) lists of (path, label)"""
+    rng = random.Random(seed)
+    calibration, held_out = [], []
+    for label in labels:
+        class_dir = os.path.join(image_dir, label)
+        if not os.path.isdir(class_dir):
+            print(f"⚠️  No images for label '{label}' in {class_dir}")
+            continue
+        files = sorted(os.path.join(class_dir, name) for name in os.listdir(class_dir)
+                       if name.lower().endswith(IMAGE_EXTENSIONS))
+        rng.shuffle(files)
+        n_holdout = int(round(len(files) * holdout))
+        held_out.extend((path, label) for path in files[:n_holdout])
+        calibration.extend((path, label) for path in files[n_holdout:])
+    rng.shuffle(calibration)
+    return calibration, held_out
+
+
+def representative_dataset(detector, samples, limit):
+    """Calibration generator for the TFLite converter"""
+    def generator():
+        used = 0
+        for path, _ in samples:
+            if used >= limit:
+                break
+            image = cv2.imread(path)
+            if image is None:
+                continue
+            used += 1
+            yield [detector.preprocess_crops([image]).copy()]
+    return generator
+
+
+def convert(float_detector, output_file, mode, calibration, num_calibration=100):
+    """Convert the frozen graph to a quantized TFLite model"""
+    converter = tf.compat.v1.lite.TFLiteConverter.from_frozen_graph(
+        float_detector.model_file,
+        input_arrays=['input'],
+        output_arrays=['final_result'],
+        input_shapes={'input': [1, float_detector.input_height, float_detector.input_width, 3]})
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == 'int8':
+        converter.representative_dataset = representative_dataset(
+            float_detector, calibration, num_calibration)
+    elif mode == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+
+    tflite_model = converter.convert()
+    with open(output_file, 'wb') as f:
+        f.write(tflite_model)
+    print(f"💾 {mode} model saved to {output_file} ({len(tflite_model) / 1e6:.1f} MB)")
+
+
+def evaluate(detector, samples):
+    """Return (predicted labels, per-image latencies in seconds) over samples"""
+    predicted, latencies = [], []
+    for path, _ in samples:
+        image = cv2.imread(path)
+        if image is None:
+            predicted.append(None)
+            continue
+        batch = detector.preprocess_crops([image])
+        start = time.perf_counter()
+        probs = detector.infer_batch(batch)[0]
+        latencies.append(time.perf_counter() - start)
+        predicted.append(detector.label_for(probs))
+    return predicted, np.array(latencies)
+
+
+def compare(float_detector, quant_detector, held_out, max_accuracy_drop=0.02):
+    """Print accuracy, agreement and latency of both models, returns True if safe to deploy"""
+    truth = [label for _, label in held_out]
+    float_pred, float_lat = evaluate(float_detector, held_out)
+    quant_pred, quant_lat = evaluate(quant_detector, held_out)
+
+    valid = [i for i in range(len(truth)) if float_pred[i] is not None]
+    if not valid:
+        print("⚠️  No readable held-out images")
+        return False
+    float_acc = np.mean([float_pred[i] == truth[i] for i in valid])
+    quant_acc = np.mean([quant_pred[i] == truth[i] for i in valid])
+    agreement = np.mean([float_pred[i] == quant_pred[i] for i in valid])
+
+    print("\n📊 Float vs Quantized (held-out split)")
+    print("="*60)
+    print(f"Images:          {len(valid)}")
+    print(f"Accuracy:        float {float_acc:.2%}   quantized {quant_acc:.2%}")
+    print(f"Agreement:       {agreement:.2%}")
+    print(f"Latency p50:     float {np.percentile(float_lat, 50)*1000:.2f}ms   "
+          f"quantized {np.percentile(quant_lat, 50)*1000:.2f}ms")
+    print(f"Latency p95:     float {np.percentile(float_lat, 95)*1000:.2f}ms   "
+          f"quantized {np.percentile(quant_lat, 95)*1000:.2f}ms")
+    print(f"Model size:      float {os.path.getsize(float_detector.model_file) / 1e6:.1f} MB   "
+          f"quantized {os.path.getsize(quant_detector.model_file) / 1e6:.1f} MB")
+    print("="*60)
+
+    safe = float_acc - quant_acc <= max_accuracy_drop
+    if safe:
+        print(f"✅ Accuracy drop within {max_accuracy_drop:.0%}, quantized model is safe to deploy")
+    else:
+        print(f"⚠️  Accuracy dropped by {float_acc - quant_acc:.2%}, keep the float model")
+    return safe
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize the facial emotion model for CPU inference")
+    parser.add_argument('--model', default='retrained_graph.pb')
+    parser.add_argument('--labels', default='retrained_labels.txt')
+    parser.add_argument('--image-dir', default='images')
+    parser.add_argument('--mode', choices=['int8', 'float16'], default='int8')
+    parser.add_argument('--output', help="output .tflite file (default: retrained_graph_<mode>.tflite)")
+    parser.add_argument('--calibration', type=int, default=100, help="images used for int8 calibration")
+    parser.add_argument('--holdout', type=float, default=0.2, help="fraction of images held out for comparison")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02)
+    parser.add_argument('--compare-only', action='store_true', help="skip conversion, compare an existing model")
+    parser.add_argument('--skip-compare', action='store_true')
+    args = parser.parse_args()
+
+    output = args.output or f"retrained_graph_{args.mode}.tflite"
+    float_detector = FacialEmotionDetector(model_file=args.model, label_file=args.labels)
+    calibration, held_out = split_dataset(args.image_dir, float_detector.labels,
+                                          args.holdout, args.seed)
+    print(f"📂 {len(calibration)} calibration images, {len(held_out)} held-out images")
+
+    if not args.compare_only:
+        print(f"🔧 Converting {args.model} to {args.mode}...")
+        convert(float_detector, output, args.mode, calibration, args.calibration)
+
+    if not args.skip_compare:
+        quant_detector = FacialEmotionDetector(model_file=output, label_file=args.labels,
+                                               runtime='tflite')
+        compare(float_detector, quant_detector, held_out, args.max_accuracy_drop)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""
+Batch Voice-Clip Scoring
+Re-scores archives of recorded voice clips offline: clips are decoded and
+featurized in a process pool, then scored a block at a time as one stacked
+feature matrix, with results streamed to CSV or JSONL.
+
+Usage:
+    python -m src.emotion_detection.audio_batch clips/ --output scores.csv --workers 4
+    python -m src.emotion_detection.audio_batch manifest.txt --output scores.jsonl
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import librosa
+import numpy as np
+
+from .audio_emotion import AudioEmotionDetector
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac', '.ogg')
+
+# Created once per worker process by init_worker
+detector = None
+
+
+def init_worker(sample_rate, vad):
+    """Build the feature pipeline once for this worker process"""
+    global detector
+    detector = AudioEmotionDetector(sample_rate=sample_rate, vad=vad)
+
+
+def find_clips(source):
+    """
+    Yield clip paths from a directory (searched recursively) or a manifest
+    A manifest is a text file with one path per line, or a CSV file with a
+    'path' column; relative paths are resolved against the manifest's folder.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    yield os.path.join(root, name)
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', newline='') as f:
+        if source.lower().endswith('.csv'):
+            paths = (row['path'] for row in csv.DictReader(f))
+        else:
+            paths = (line.strip() for line in f)
+        for path in paths:
+            if path and not path.startswith('#'):
+                yield path if os.path.isabs(path) else os.path.join(base, path)
+
+
+def featurize(path):
+    """Decode one clip, gate it on voice activity and compute its features, runs inside a worker"""
+    result = {'path': path, 'duration': 0.0, 'voiced_ratio': 0.0, 'features': None, 'error': None}
+    try:
+        audio, _ = librosa.load(path, sr=detector.sample_rate, mono=True)
+        result['duration'] = len(audio) / float(detector.sample_rate)
+        if detector.vad is not None:
+            audio, result['voiced_ratio'] = detector.vad.voiced_audio(audio)
+        else:
+            result['voiced_ratio'] = 1.0
+        if len(audio):
+            features = detector.feature_engine.compute(audio)
+            # 44-value feature vector followed by the clip energy
+            result['features'] = np.append(detector.feature_engine.to_vector(features),
+                                           features['energy']).astype(np.float32)
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+class ResultWriter:
+    """Streams result rows to a CSV or JSONL file ('-' for stdout)"""
+    def __init__(self, output, labels, fmt=None):
+        if fmt is None:
+            fmt = 'jsonl' if output.lower().endswith(('.jsonl', '.json')) else 'csv'
+        self.fmt = fmt
+        self.columns = ['path', 'emotion', 'confidence'] + list(labels) + \
+            ['voiced_ratio', 'duration', 'error']
+        self.file = sys.stdout if output == '-' else open(output, 'w', newline='')
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(self.file, fieldnames=self.columns)
+            self.writer.writeheader()
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.file is not sys.stdout:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def score_block(scorer, block):
+    """Score a list of featurize() results together, returns one row dict per clip"""
+    scored = [r for r in block if r['features'] is not None]
+    probs = {}
+    if scored:
+        matrix = np.stack([r['features'] for r in scored])
+        zcr_column = scorer.feature_engine.n_mfcc
+        for r, p in zip(scored, scorer.score_batch(matrix[:, -1], matrix[:, zcr_column])):
+            probs[r['path']] = p
+
+    silence = np.array([scorer.silence_probabilities()[e] for e in scorer.emotion_labels])
+    rows = []
+    for r in block:
+        row = {'path': r['path'], 'voiced_ratio': round(r['voiced_ratio'], 4),
+               'duration': round(r['duration'], 3), 'error': r['error']}
+        if r['error'] is None:
+            p = probs.get(r['path'], silence)
+            best = int(np.argmax(p))
+            row['emotion'] = scorer.emotion_labels[best] if r['features'] is not None else 'silent'
+            row['confidence'] = round(float(p[best]), 4)
+            row.update({e: round(float(v), 4) for e, v in zip(scorer.emotion_labels, p)})
+        rows.append(row)
+    return rows
+
+
+def score_clips(paths, workers=None, sample_rate=22050, vad=True, block_size=256):
+    """Yield one row dict per clip, in input order"""
+    scorer = AudioEmotionDetector(sample_rate=sample_rate, vad=vad)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(sample_rate, vad)) as pool:
+        block = []
+        for result in pool.map(featurize, paths, chunksize=4):
+            block.append(result)
+            if len(block) >= block_size:
+                yield from score_block(scorer, block)
+                block = []
+        if block:
+            yield from score_block(scorer, block)
+
+
+def score_archive(source, output, workers=None, fmt=None, sample_rate=22050, vad=True,
+                  block_size=256):
+    """Score every clip in a directory or manifest into output, returns a summary dict"""
+    paths = list(find_clips(source))
+    labels = AudioEmotionDetector(sample_rate=sample_rate, vad=vad).emotion_labels
+    counts = {'scored': 0, 'silent': 0, 'failed': 0}
+    failures = []
+    audio_seconds = 0.0
+    start = time.time()
+
+    with ResultWriter(output, labels, fmt) as writer:
+        for i, row in enumerate(score_clips(paths, workers, sample_rate, vad, block_size), 1):
+            writer.write(row)
+            audio_seconds += row['duration']
+            if row['error'] is not None:
+                counts['failed'] += 1
+                failures.append((row['path'], row['error']))
+            elif row['emotion'] == 'silent':
+                counts['silent'] += 1
+            else:
+                counts['scored'] += 1
+            if i % block_size == 0 or i == len(paths):
+                writer.flush()
+                elapsed = max(time.time() - start, 1e-6)
+                print(f"   {i}/{len(paths)} clips ({i / elapsed:.1f} clips/s, "
+                      f"{audio_seconds / elapsed:.0f}x realtime)", file=sys.stderr)
+
+    elapsed = time.time() - start
+    return {
+        'clips': len(paths),
+        'scored': counts['scored'],
+        'silent': counts['silent'],
+        'failed': counts['failed'],
+        'failures': failures,
+        'audio_seconds': audio_seconds,
+        'seconds': elapsed,
+        'clips_per_second': len(paths) / elapsed if elapsed > 0 else 0.0,
+        'realtime_factor': audio_seconds / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an archive of voice clips offline")
+    parser.add_argument('source', help="directory of WAV/MP3 clips, or a manifest (.txt or .csv with a 'path' column)")
+    parser.add_argument('--output', '-o', default='-', help="CSV or JSONL output file (default: stdout)")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                        help="output format (default: from the output extension)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--sample-rate', type=int, default=22050)
+    parser.add_argument('--block-size', type=int, default=256,
+                        help="clips scored together per feature matrix")
+    parser.add_argument('--no-vad', action='store_true', help="analyze silence too")
+    args = parser.parse_args()
+
+    print(f"🎧 Scoring voice clips from {args.source}...", file=sys.stderr)
+    summary = score_archive(args.source, args.output, args.workers, args.format,
+                            args.sample_rate, not args.no_vad, args.block_size)
+
+    print(f"✅ {summary['scored']} scored, {summary['silent']} silent, "
+          f"{summary['failed']} failed", file=sys.stderr)
+    print(f"⏱️  {summary['seconds']:.1f}s ({summary['clips_per_second']:.1f} clips/s, "
+          f"{summary['realtime_factor']:.0f}x realtime)", file=sys.stderr)
+    for path, error in summary['failures']:
+        print(f"⚠️  {path}: {error}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,74 @@ Audio Emotion Recognition Module
 Detects emotions from voice/audio using speech features
 """
 import numpy as np
-import librosa
-import sounddevice as sd
 from scipy.io.wavfile import write
 import os
+import threading
+import time
+
+from .spectral_features import SpectralFeatureEngine
+from .voice_activity import VoiceActivityDetector
+
+class AudioRingBuffer:
+    """Fixed-size ring buffer of mono float32 samples, written from the audio callback"""
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity, dtype=np.float32)
+        self.write_pos = 0
+        self.total_written = 0
+        self.lock = threading.Lock()
+        self.data_ready = threading.Condition(self.lock)
+        
+    def write(self, samples):
+        """Append samples, overwriting the oldest ones once the buffer is full"""
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if len(samples) > self.capacity:
+            samples = samples[-self.capacity:]
+        with self.lock:
+            end = self.write_pos + len(samples)
+            if end <= self.capacity:
+                self.buffer[self.write_pos:end] = samples
+            else:
+                split = self.capacity - self.write_pos
+                self.buffer[self.write_pos:] = samples[:split]
+                self.buffer[:end - self.capacity] = samples[split:]
+            self.write_pos = end % self.capacity
+            self.total_written += len(samples)
+            self.data_ready.notify_all()
+            
+    def available(self):
+        """Number of valid samples currently held"""
+        return min(self.total_written, self.capacity)
+        
+    def latest(self, n):
+        """Return the most recent n samples in chronological order"""
+        with self.lock:
+            n = min(n, self.total_written, self.capacity)
+            start = self.write_pos - n
+            if start >= 0:
+                return self.buffer[start:self.write_pos].copy()
+            return np.concatenate([self.buffer[start:], self.buffer[:self.write_pos]])
+            
+    def wait_for(self, total, timeout=None):
+        """Block until total_written reaches total, returns False on timeout"""
+        with self.lock:
+            return self.data_ready.wait_for(lambda: self.total_written >= total, timeout)
 
 class AudioEmotionDetector:
-    def __init__(self, sample_rate=22050, duration=5):
+    def __init__(self, sample_rate=22050, duration=5, vad=True):
         self.sample_rate = sample_rate
         self.duration = duration
         self.emotion_labels = ['angry', 'happy', 'neutral', 'sad']
+        # One STFT per clip shared by every spectral feature
+        self.feature_engine = SpectralFeatureEngine(sample_rate=sample_rate)
+        # Energy/ZCR gate so features and scoring only see speech
+        self.vad = VoiceActivityDetector(sample_rate=sample_rate) if vad else None
+        self.last_voiced_ratio = None
         
     def record_audio(self, duration=None):
         """Record audio from microphone"""
+        # Imported here so offline scoring works on machines without PortAudio
+        import sounddevice as sd
         if duration is None:
             duration = self.duration
             
@@ -28,72 +83,144 @@ class AudioEmotionDetector:
         return audio.flatten()
         
     def extract_features(self, audio_data):
-        """Extract MFCC and other audio features"""
-        # MFCCs (Mel-Frequency Cepstral Coefficients)
-        mfccs = librosa.feature.mfcc(y=audio_data, sr=self.sample_rate, n_mfcc=40)
-        mfccs_mean = np.mean(mfccs.T, axis=0)
-        
-        # Zero Crossing Rate
-        zcr = np.mean(librosa.feature.zero_crossing_rate(audio_data))
+        """Extract MFCC and other audio features as one 44-value vector"""
+        return self.feature_engine.to_vector(self.feature_engine.compute(audio_data))
         
-        # Spectral features
-        spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=audio_data, sr=self.sample_rate))
-        spectral_rolloff = np.mean(librosa.feature.spectral_rolloff(y=audio_data, sr=self.sample_rate))
-        
-        # Chroma features
-        chroma = np.mean(librosa.feature.chroma_stft(y=audio_data, sr=self.sample_rate))
-        
-        # Combine features
-        features = np.concatenate([
-            mfccs_mean,
-            [zcr, spectral_centroid, spectral_rolloff, chroma]
-        ])
-        
-        return features
-        
-    def predict_emotion_simple(self, audio_data):
+    def predict_emotion_simple(self, audio_data, features=None):
         """Simple rule-based emotion prediction based on audio characteristics"""
-        features = self.extract_features(audio_data)
-        
-        # Get energy and pitch characteristics
-        energy = np.mean(np.abs(audio_data))
-        zcr = np.mean(librosa.feature.zero_crossing_rate(audio_data))
+        if features is None:
+            features = self.feature_engine.compute(audio_data)
+            
+        # Same rules as the batch path, applied to one clip
+        probs = self.score_batch([features['energy']], [features['zcr']])[0]
+        return dict(zip(self.emotion_labels, probs.tolist()))
+        
+    def score_batch(self, energy, zcr):
+        """
+        Vectorized rule-based scoring over arrays of clip energies and
+        zero-crossing rates, returns an (N, len(emotion_labels)) array
+        """
+        energy = np.asarray(energy, dtype=np.float64)
+        zcr = np.asarray(zcr, dtype=np.float64)
+        label = self.emotion_labels.index
         
         # Simple heuristic classification
-        if energy > 0.02 and zcr > 0.1:
-            emotion = 'angry'
-            confidence = 0.75
-        elif energy > 0.015:
-            emotion = 'happy'
-            confidence = 0.70
-        elif energy < 0.008:
-            emotion = 'sad'
-            confidence = 0.65
-        else:
-            emotion = 'neutral'
-            confidence = 0.60
-            
+        conditions = [(energy > 0.02) & (zcr > 0.1), energy > 0.015, energy < 0.008]
+        emotion = np.select(conditions, [label('angry'), label('happy'), label('sad')],
+                            default=label('neutral'))
+        confidence = np.select(conditions, [0.75, 0.70, 0.65], default=0.60)
+        
         # Return probabilities
-        probs = {e: 0.1 for e in self.emotion_labels}
-        probs[emotion] = confidence
+        probs = np.full((len(energy), len(self.emotion_labels)), 0.1)
+        probs[np.arange(len(energy)), emotion] = confidence
         
         # Normalize
-        total = sum(probs.values())
-        probs = {k: v/total for k, v in probs.items()}
-        
-        return probs
+        return probs / probs.sum(axis=1, keepdims=True)
+        
+    def silence_probabilities(self):
+        """Uniform probabilities, returned when a clip contains no speech"""
+        return {e: 1.0 / len(self.emotion_labels) for e in self.emotion_labels}
+        
+    def analyze(self, audio_data):
+        """
+        Return (probs, voiced_ratio)
+        Non-speech frames are dropped by the voice activity detector before
+        any spectral feature is computed; a clip without enough speech gets
+        uniform probabilities instead of being scored as quiet (= sad).
+        """
+        if self.vad is None:
+            return self.predict_emotion_simple(audio_data), 1.0
+        voiced, ratio = self.vad.voiced_audio(audio_data)
+        self.last_voiced_ratio = ratio
+        if len(voiced) == 0:
+            return self.silence_probabilities(), ratio
+        return self.predict_emotion_simple(voiced), ratio
         
     def get_emotion_probabilities(self, audio_data=None):
         """Get emotion probabilities from audio"""
         if audio_data is None:
             audio_data = self.record_audio()
             
-        return self.predict_emotion_simple(audio_data)
+        probs, _ = self.analyze(audio_data)
+        return probs
+        
+    def stream_emotions(self, window=2.0, hop=0.5, min_window=1.0, max_duration=None,
+                        buffer_seconds=10.0, stop_event=None):
+        """
+        Stream emotion estimates from the microphone
+        Audio is written by an InputStream callback into a fixed-size ring
+        buffer; every `hop` seconds the latest `window` seconds (at least
+        `min_window`) are analyzed. Yields (elapsed_seconds, probs) while the
+        stream runs; memory stays constant however long the session is.
+        Windows without speech are skipped without being scored. Setting
+        stop_event (a threading.Event) ends the stream and closes the
+        microphone within about one hop, even while nothing is yielded.
+        """
+        import sounddevice as sd
+        ring = AudioRingBuffer(int(buffer_seconds * self.sample_rate))
+        hop_samples = int(hop * self.sample_rate)
+        window_samples = int(window * self.sample_rate)
+        min_samples = int(min_window * self.sample_rate)
+        
+        def callback(indata, frames, time_info, status):
+            ring.write(indata[:, 0])
+            
+        start = time.time()
+        with sd.InputStream(samplerate=self.sample_rate, channels=1, dtype='float32',
+                            blocksize=hop_samples, callback=callback):
+            next_total = min_samples
+            while max_duration is None or time.time() - start < max_duration:
+                if stop_event is not None and stop_event.is_set():
+                    return
+                if not ring.wait_for(next_total, timeout=max(1.0, 4 * hop)):
+                    print("⚠️  No audio received from microphone")
+                    return
+                audio = ring.latest(window_samples)
+                next_total = ring.total_written + hop_samples
+                if self.vad is not None:
+                    audio, self.last_voiced_ratio = self.vad.voiced_audio(audio)
+                    if len(audio) == 0:
+                        continue
+                yield ring.total_written / float(self.sample_rate), self.predict_emotion_simple(audio)
+                
+    def detect_streaming(self, min_margin=0.3, min_estimates=3, timeout=None, **stream_args):
+        """
+        Return (emotion, probs) as soon as the average of at least
+        min_estimates streaming estimates leads the runner-up by min_margin
+        and the latest estimate agrees with it, or the average of all
+        estimates once `timeout` seconds (default: self.duration) have passed
+        The rule-based scorer gives every estimate about the same top
+        probability, so the decision rests on how consistently the estimates
+        agree: all-equal estimates average to a margin of about 0.6, a 3:1
+        split to about 0.3 and a 2:1 split to about 0.2.
+        """
+        if timeout is None:
+            timeout = self.duration
+        print("🎤 Listening...")
+        history = []
+        for elapsed, probs in self.stream_emotions(max_duration=timeout, **stream_args):
+            history.append([probs[e] for e in self.emotion_labels])
+            if len(history) < min_estimates:
+                continue
+            mean = np.mean(history, axis=0)
+            runner_up, best = np.argsort(mean)[-2:]
+            if mean[best] - mean[runner_up] >= min_margin and \
+                    max(probs, key=probs.get) == self.emotion_labels[best]:
+                print(f"✅ Confident after {elapsed:.1f}s")
+                probs = dict(zip(self.emotion_labels, mean.tolist()))
+                return self.emotion_labels[best], probs
+                
+        if not history:
+            probs = self.silence_probabilities()
+        else:
+            probs = dict(zip(self.emotion_labels, np.mean(history, axis=0).tolist()))
+        return max(probs, key=probs.get), probs
         
     def detect_from_microphone(self):
         """Detect emotion from microphone input"""
         audio = self.record_audio()
-        probs = self.get_emotion_probabilities(audio)
+        probs, voiced_ratio = self.analyze(audio)
+        print(f"🗣️  Voiced: {voiced_ratio:.0%} of the recording")
         
         # Get dominant emotion
         emotion = max(probs, key=probs.get)
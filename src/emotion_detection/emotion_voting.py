@@ -0,0 +1,61 @@
+"""
+Sequential Emotion Voting
+Accumulates per-frame softmax outputs and stops as soon as one emotion is clear
+"""
+import numpy as np
+
+
+class SequentialEmotionVoter:
+    """
+    Sequential test over per-frame softmax vectors
+
+    Each frame's softmax is treated as independent evidence: log-probabilities
+    are summed and renormalized into a posterior over the classes. A decision
+    is made once the leading class passes `confidence` after at least
+    `min_frames` frames, or unconditionally when `max_frames` is reached.
+    `evidence_weight` (< 1) tempers each frame because consecutive webcam
+    frames are strongly correlated.
+    """
+    def __init__(self, num_classes, confidence=0.9, min_frames=3, max_frames=10,
+                 evidence_weight=0.5, eps=1e-6):
+        self.num_classes = num_classes
+        self.confidence = confidence
+        self.min_frames = min_frames
+        self.max_frames = max_frames
+        self.evidence_weight = evidence_weight
+        self.eps = eps
+        self.reset()
+
+    def reset(self):
+        """Start a new decision window"""
+        self.log_evidence = np.zeros(self.num_classes, dtype=np.float64)
+        self.frames = 0
+
+    def update(self, probs):
+        """Add one softmax vector, returns True once a decision has been reached"""
+        probs = np.asarray(probs, dtype=np.float64).reshape(-1)
+        self.log_evidence += self.evidence_weight * np.log(probs + self.eps)
+        self.frames += 1
+        return self.done
+
+    @property
+    def posterior(self):
+        """Current posterior over the classes"""
+        shifted = self.log_evidence - np.max(self.log_evidence)
+        weights = np.exp(shifted)
+        return weights / np.sum(weights)
+
+    @property
+    def done(self):
+        """True when the leading class is confident enough or the budget is spent"""
+        if self.frames >= self.max_frames:
+            return True
+        if self.frames < self.min_frames:
+            return False
+        return float(np.max(self.posterior)) >= self.confidence
+
+    def decision(self):
+        """Return (class_index, confidence, frames_used) for the current evidence"""
+        posterior = self.posterior
+        index = int(np.argmax(posterior))
+        return index, float(posterior[index]), self.frames
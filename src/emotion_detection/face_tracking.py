@@ -0,0 +1,159 @@
+"""
+Face Tracking Module
+Propagates Haar detections between frames with cheap template matching
+"""
+import cv2
+
+
+class TrackedFace:
+    """A face box with a stable ID and the template used to follow it"""
+    def __init__(self, face_id, box, template):
+        self.face_id = face_id
+        self.box = box
+        self.template = template
+        self.confidence = 1.0
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def box_fits(box, frame_w, frame_h):
+    """True if a non-empty (x, y, w, h) box lies entirely inside the frame"""
+    x, y, w, h = box
+    return w > 0 and h > 0 and x >= 0 and y >= 0 and x + w <= frame_w and y + h <= frame_h
+
+
+class FaceTracker:
+    """
+    Runs the Haar cascade every detect_interval frames (or as soon as a
+    track loses confidence) and follows faces with a template match limited
+    to a small search window in between. All work happens on a downscaled
+    grayscale frame; returned boxes are in full-frame coordinates.
+
+    With adaptive=True the downscale factor is re-chosen at every detection
+    so the smallest tracked face is about target_face_size pixels wide in
+    the detection frame: close faces are found on a much smaller image.
+    """
+    def __init__(self, classifier, detect_interval=10, min_confidence=0.6,
+                 search_margin=0.5, downscale=4, match_iou=0.3,
+                 adaptive=False, target_face_size=48, max_downscale=8):
+        self.classifier = classifier
+        self.detect_interval = detect_interval
+        self.min_confidence = min_confidence
+        self.search_margin = search_margin
+        self.downscale = downscale
+        self.match_iou = match_iou
+        self.adaptive = adaptive
+        self.target_face_size = target_face_size
+        self.max_downscale = max_downscale
+        self.scale = downscale
+
+        self.tracks = []
+        self.frame_index = 0
+        self.next_id = 0
+        self.detections_run = 0
+
+    def reset(self):
+        """Forget all tracks so the next frame runs full detection"""
+        self.tracks = []
+        self.frame_index = 0
+        self.scale = self.downscale
+
+    def update(self, frame):
+        """Return a list of (face_id, (x, y, w, h)) for the given BGR frame"""
+        detect = self._needs_detection()
+        if detect and self.adaptive:
+            self._adapt_scale()
+
+        size = self.scale
+        mini = cv2.resize(frame, (int(frame.shape[1]/size), int(frame.shape[0]/size)))
+        gray = cv2.cvtColor(mini, cv2.COLOR_BGR2GRAY)
+
+        if detect:
+            self._detect(gray)
+        else:
+            self._track(gray)
+        self.frame_index += 1
+
+        # A smaller frame (e.g. the next image of a folder) can leave old boxes outside it
+        frame_h, frame_w = gray.shape[:2]
+        self.tracks = [t for t in self.tracks if box_fits(t.box, frame_w, frame_h)]
+        return [(t.face_id, tuple(int(v * size) for v in t.box)) for t in self.tracks]
+
+    def _adapt_scale(self):
+        """Pick the coarsest downscale that keeps the smallest face near target_face_size"""
+        if self.tracks:
+            smallest = min(t.box[2] for t in self.tracks) * self.scale
+            scale = smallest / float(self.target_face_size)
+        else:
+            # Nothing tracked: go back to the configured factor to find new faces
+            scale = self.downscale
+        scale = min(max(scale, 1.0), self.max_downscale)
+        if abs(scale - self.scale) < 0.25 * self.scale:
+            return
+
+        # Keep existing boxes in detection-frame coordinates for ID matching
+        ratio = self.scale / scale
+        for track in self.tracks:
+            track.box = tuple(int(v * ratio) for v in track.box)
+        self.scale = scale
+
+    def _needs_detection(self):
+        if not self.tracks:
+            return True
+        if self.frame_index % self.detect_interval == 0:
+            return True
+        return any(t.confidence < self.min_confidence for t in self.tracks)
+
+    def _detect(self, gray):
+        self.detections_run += 1
+        faces = self.classifier.detectMultiScale(gray)
+
+        tracks = []
+        unmatched = list(self.tracks)
+        for f in faces:
+            box = tuple(int(v) for v in f)
+            # Keep the ID of the previous track that overlaps this detection best
+            best, best_iou = None, self.match_iou
+            for track in unmatched:
+                iou = box_iou(box, track.box)
+                if iou >= best_iou:
+                    best, best_iou = track, iou
+            if best is not None:
+                unmatched.remove(best)
+                face_id = best.face_id
+            else:
+                face_id = self.next_id
+                self.next_id += 1
+
+            x, y, w, h = box
+            tracks.append(TrackedFace(face_id, box, gray[y:y+h, x:x+w].copy()))
+        self.tracks = tracks
+
+    def _track(self, gray):
+        frame_h, frame_w = gray.shape[:2]
+        for track in self.tracks:
+            x, y, w, h = track.box
+            mx = int(w * self.search_margin)
+            my = int(h * self.search_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(frame_w, x + w + mx), min(frame_h, y + h + my)
+            window = gray[y0:y1, x0:x1]
+
+            if window.shape[0] < h or window.shape[1] < w:
+                track.confidence = 0.0
+                continue
+
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, max_val, _, max_loc = cv2.minMaxLoc(scores)
+            track.box = (x0 + max_loc[0], y0 + max_loc[1], w, h)
+            track.confidence = float(max_val)
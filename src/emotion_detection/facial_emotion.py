@@ -7,25 +7,137 @@ import numpy as np
 import tensorflow as tf
 from collections import Counter
 
+from .emotion_voting import SequentialEmotionVoter
+from .inference_worker import DEFAULT_ADDRESS, FacialInferenceClient
+from .prediction_cache import PredictionCache
+from .webcam_pipeline import WebcamEmotionPipeline
+
 class FacialEmotionDetector:
     def __init__(self, model_file='retrained_graph.pb', label_file='retrained_labels.txt', 
-                 cascade_file='haarcascade_frontalface_alt.xml'):
+                 cascade_file='haarcascade_frontalface_alt.xml', runtime='graph', num_threads=None,
+                 cache_size=32, cache_distance=6, worker_address=None,
+                 function_batch_size=8, xla=False, cache_anonymous=False):
+        """
+        runtime: 'graph' runs the frozen float32 GraphDef in a TF1 session,
+        'function' wraps the same GraphDef as a TF2 concrete function with a
+        fixed (function_batch_size, 224, 224, 3) input, XLA-compiled if xla=True,
+        'tflite' runs a (quantized) .tflite variant made by quantize_model.py,
+        'remote' sends crops to a running inference_worker (worker_address)
+        cache_size: faces kept in the prediction cache (0 disables it);
+        cache_distance: max crop-hash bit difference still treated as unchanged;
+        only crops with a tracked face_id are cached unless cache_anonymous=True
+        """
         self.model_file = model_file
         self.label_file = label_file
+        self.runtime = runtime
+        self.num_threads = num_threads
+        self.worker_address = worker_address
+        self.function_batch_size = function_batch_size
+        self.xla = xla
         self.classifier = cv2.CascadeClassifier(cascade_file)
         self.emotion_dict = {'angry': '1', 'happy': '2', 'neutral or sad': '3'}
         self.predictions = []
+        self.input_height = 224
+        self.input_width = 224
+        self.input_mean = 128
+        self.input_std = 128
+        self._input_buffer = None
+        self.prediction_cache = None
+        if cache_size:
+            self.prediction_cache = PredictionCache(max_entries=cache_size,
+                                                    max_distance=cache_distance,
+                                                    anonymous=cache_anonymous)
         self.load_model()
         
     def load_model(self):
-        """Load TensorFlow model"""
-        tf.compat.v1.disable_eager_execution()
+        """Load the model for the configured runtime and build a long-lived inference context"""
+        self.session = None
+        self.interpreter = None
+        self.client = None
+        if self.runtime == 'remote':
+            # The worker owns the model, labels and prediction cache
+            self.client = FacialInferenceClient(self.worker_address or DEFAULT_ADDRESS)
+            self.labels = self.client.labels
+            self.prediction_cache = None
+            return
+        if self.runtime == 'tflite':
+            self._load_tflite_model()
+        elif self.runtime == 'function':
+            self._load_function_model()
+        elif self.runtime == 'graph':
+            self._load_graph_model()
+        else:
+            raise ValueError(f"Unknown facial model runtime: {self.runtime}")
+        self.labels = self.load_labels()
+        
+    def _load_graph_model(self):
+        """Load the frozen TensorFlow graph into its own tf.Graph and session"""
+        # Everything lives in self.graph, so no global disable_eager_execution() is needed
         self.graph = tf.Graph()
         graph_def = tf.compat.v1.GraphDef()
         with open(self.model_file, "rb") as f:
             graph_def.ParseFromString(f.read())
         with self.graph.as_default():
             tf.import_graph_def(graph_def)
+            self._build_preprocessing()
+            
+        # Resolve graph endpoints once instead of on every prediction
+        self.input_tensor = self.graph.get_operation_by_name("import/input").outputs[0]
+        self.output_tensor = self.graph.get_operation_by_name("import/final_result").outputs[0]
+        
+        # One session bound to self.graph, reused by every prediction
+        self.session = tf.compat.v1.Session(graph=self.graph)
+        
+    def _load_function_model(self):
+        """Wrap the frozen GraphDef as a TF2 concrete function with a fixed batch shape"""
+        if not tf.executing_eagerly():
+            raise RuntimeError("runtime='function' needs eager execution, but it was "
+                               "disabled globally in this process")
+        graph_def = tf.compat.v1.GraphDef()
+        with open(self.model_file, "rb") as f:
+            graph_def.ParseFromString(f.read())
+            
+        def _import():
+            tf.compat.v1.import_graph_def(graph_def, name="import")
+        wrapped = tf.compat.v1.wrap_function(_import, [])
+        pruned = wrapped.prune(wrapped.graph.as_graph_element("import/input:0"),
+                               wrapped.graph.as_graph_element("import/final_result:0"))
+        
+        spec = tf.TensorSpec([self.function_batch_size, self.input_height, self.input_width, 3],
+                             tf.float32)
+        compiled = tf.function(lambda images: pruned(images), input_signature=[spec],
+                               jit_compile=self.xla)
+        # Trace (and compile) once up front instead of on the first frame
+        self._function = compiled.get_concrete_function()
+        self._function_input = np.zeros(spec.shape, dtype=np.float32)
+        
+    def _load_tflite_model(self):
+        """Load a TensorFlow Lite (int8/float16 quantized) variant of the model"""
+        self.interpreter = tf.lite.Interpreter(model_path=self.model_file,
+                                               num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        self._tflite_input = self.interpreter.get_input_details()[0]
+        self._tflite_output = self.interpreter.get_output_details()[0]
+        
+    def _build_preprocessing(self):
+        """Build the decode/resize/normalize stage once inside self.graph"""
+        self.image_path = tf.compat.v1.placeholder(tf.string, name='image_path')
+        file_reader = tf.compat.v1.read_file(self.image_path, "file_reader")
+        image_reader = tf.image.decode_jpeg(file_reader, channels=3, name='jpeg_reader')
+        float_caster = tf.cast(image_reader, tf.float32)
+        dims_expander = tf.expand_dims(float_caster, 0)
+        resized = tf.compat.v1.image.resize_bilinear(dims_expander, [self.input_height, self.input_width])
+        self.normalized = tf.divide(tf.subtract(resized, [self.input_mean]), [self.input_std])
+        
+    def close(self):
+        """Release the inference session"""
+        if getattr(self, 'session', None) is not None:
+            self.session.close()
+            self.session = None
+        self.interpreter = None
+        if getattr(self, 'client', None) is not None:
+            self.client.close()
+            self.client = None
             
     def load_labels(self):
         """Load emotion labels"""
@@ -35,41 +147,135 @@ class FacialEmotionDetector:
             labels.append(l.rstrip())
         return labels
         
-    def predict_emotion(self, image_path):
-        """Predict emotion from image"""
-        input_height = 224
-        input_width = 224
-        input_mean = 128
-        input_std = 128
+    def predict_emotion(self, image):
+        """
+        Predict emotion from a BGR face crop (NumPy array) or an image path
+        Arrays are preprocessed in memory; paths go through the JPEG decode stage.
+        """
+        if not isinstance(image, np.ndarray) and self.runtime != 'graph':
+            image = cv2.imread(image)
+        if isinstance(image, np.ndarray):
+            results = self.predict_batch([image])
+        else:
+            t = self.session.run(self.normalized, {self.image_path: image})
+            results = self.session.run(self.output_tensor, {self.input_tensor: t})
         
-        file_reader = tf.compat.v1.read_file(image_path, "file_reader")
-        image_reader = tf.image.decode_jpeg(file_reader, channels=3, name='jpeg_reader')
-        float_caster = tf.cast(image_reader, tf.float32)
-        dims_expander = tf.expand_dims(float_caster, 0)
-        resized = tf.compat.v1.image.resize_bilinear(dims_expander, [input_height, input_width])
-        normalized = tf.divide(tf.subtract(resized, [input_mean]), [input_std])
+        results = np.squeeze(results)
+        top_k = results.argsort()[-5:][::-1]
         
-        sess = tf.compat.v1.Session()
-        t = sess.run(normalized)
+        return self.labels[top_k[0]]
         
-        input_name = "import/input"
-        output_name = "import/final_result"
-        input_operation = self.graph.get_operation_by_name(input_name)
-        output_operation = self.graph.get_operation_by_name(output_name)
+    def _input_batch(self, n):
+        """Return a view of the reusable float32 input buffer sized for n crops"""
+        if self._input_buffer is None or self._input_buffer.shape[0] < n:
+            self._input_buffer = np.empty((n, self.input_height, self.input_width, 3),
+                                          dtype=np.float32)
+        return self._input_buffer[:n]
         
-        with tf.compat.v1.Session(graph=self.graph) as sess:
-            results = sess.run(output_operation.outputs[0], {input_operation.outputs[0]: t})
+    def preprocess_crops(self, crops):
+        """Resize and normalize BGR face crops into the preallocated NHWC input buffer"""
+        batch = self._input_batch(len(crops))
+        for i, crop in enumerate(crops):
+            resized = cv2.resize(crop, (self.input_width, self.input_height),
+                                 interpolation=cv2.INTER_LINEAR)
+            # The model was trained on RGB JPEG decodes, OpenCV crops are BGR
+            batch[i] = resized[:, :, ::-1]
+        np.subtract(batch, self.input_mean, out=batch)
+        np.divide(batch, self.input_std, out=batch)
+        return batch
         
-        results = np.squeeze(results)
-        top_k = results.argsort()[-5:][::-1]
-        labels = self.load_labels()
+    def predict_batch(self, crops, face_ids=None, return_hits=False):
+        """
+        Predict emotions for several face crops in a single forward pass
+        Returns an (N, num_labels) array of softmax vectors, one row per crop.
+        Crops that match the prediction cache (same tracked face_id, nearly
+        identical pixels) reuse their last softmax and skip the model; crops
+        without a face_id always run the model. With return_hits=True a
+        boolean array marking the reused rows is returned as well, so
+        callers can avoid counting a reused softmax as new evidence.
+        """
+        if len(crops) == 0:
+            results = np.zeros((0, len(self.labels)), dtype=np.float32)
+            return (results, np.zeros(0, dtype=bool)) if return_hits else results
+        if self.client is not None:
+            return self.client.predict_batch(crops, face_ids, return_hits=return_hits)
+        hits = np.zeros(len(crops), dtype=bool)
+        if self.prediction_cache is None or (face_ids is None and
+                                             not self.prediction_cache.anonymous):
+            results = self.infer_batch(self.preprocess_crops(crops))
+            return (results, hits) if return_hits else results
+        
+        if face_ids is None:
+            face_ids = [None] * len(crops)
+        results = [None] * len(crops)
+        misses = []
+        for i, (crop, face_id) in enumerate(zip(crops, face_ids)):
+            probs, h = self.prediction_cache.lookup(crop, face_id)
+            if probs is None:
+                misses.append((i, h))
+            else:
+                results[i] = probs
+                hits[i] = True
+                
+        if misses:
+            batch_probs = self.infer_batch(self.preprocess_crops([crops[i] for i, _ in misses]))
+            for (i, h), probs in zip(misses, batch_probs):
+                self.prediction_cache.store(h, probs, face_ids[i])
+                results[i] = probs
+        results = np.stack(results)
+        return (results, hits) if return_hits else results
+        
+    def infer_batch(self, batch):
+        """Run the model on a preprocessed NHWC batch, returns (N, num_labels) softmax"""
+        if self.runtime == 'tflite':
+            results = self._infer_tflite(batch)
+        elif self.runtime == 'function':
+            results = self._infer_function(batch)
+        else:
+            results = self.session.run(self.output_tensor, {self.input_tensor: batch})
+        return np.reshape(results, (len(batch), -1))
+        
+    def _infer_function(self, batch):
+        """Run a batch through the concrete function in fixed-size, zero-padded chunks"""
+        size = self.function_batch_size
+        outputs = []
+        for start in range(0, len(batch), size):
+            chunk = batch[start:start + size]
+            self._function_input[:len(chunk)] = chunk
+            self._function_input[len(chunk):] = 0.0
+            result = self._function(tf.constant(self._function_input))
+            outputs.append(np.reshape(result.numpy(), (size, -1))[:len(chunk)])
+        return np.concatenate(outputs)
+        
+    def _infer_tflite(self, batch):
+        """Run a batch through the TFLite interpreter, (de)quantizing I/O if needed"""
+        if self._tflite_input['shape'][0] != len(batch):
+            self.interpreter.resize_tensor_input(self._tflite_input['index'], list(batch.shape))
+            self.interpreter.allocate_tensors()
+            self._tflite_input = self.interpreter.get_input_details()[0]
+            self._tflite_output = self.interpreter.get_output_details()[0]
+            
+        data = batch
+        if self._tflite_input['dtype'] != np.float32:
+            scale, zero_point = self._tflite_input['quantization']
+            data = np.round(batch / scale + zero_point).astype(self._tflite_input['dtype'])
+        self.interpreter.set_tensor(self._tflite_input['index'], data)
+        self.interpreter.invoke()
+        
+        results = self.interpreter.get_tensor(self._tflite_output['index'])
+        if self._tflite_output['dtype'] != np.float32:
+            scale, zero_point = self._tflite_output['quantization']
+            results = (results.astype(np.float32) - zero_point) * scale
+        return results
         
-        return labels[top_k[0]]
+    def label_for(self, probs):
+        """Return the label with the highest probability in a softmax vector"""
+        return self.labels[int(np.argmax(probs))]
         
-    def get_emotion_probabilities(self, image_path):
-        """Get emotion probabilities for all classes"""
+    def get_emotion_probabilities(self, image):
+        """Get emotion probabilities for all classes from a face crop or image path"""
         # Returns dict: {'angry': 0.1, 'happy': 0.7, 'neutral': 0.2}
-        emotion = self.predict_emotion(image_path)
+        emotion = self.predict_emotion(image)
         emotion_code = self.emotion_dict.get(emotion.lower(), '3')
         
         # Simple mapping for now
@@ -82,45 +288,44 @@ class FacialEmotionDetector:
             probs['neutral'] = 0.9
         return probs
         
-    def detect_from_webcam(self, num_predictions=10):
-        """Detect emotion from webcam stream"""
-        webcam = cv2.VideoCapture(0)
-        self.predictions = []
-        size = 4
-        
-        while len(self.predictions) < num_predictions:
-            (rval, im) = webcam.read()
-            if not rval:
-                break
-                
-            im = cv2.flip(im, 1, 0)
-            mini = cv2.resize(im, (int(im.shape[1]/size), int(im.shape[0]/size)))
-            faces = self.classifier.detectMultiScale(mini)
-            
-            for f in faces:
-                (x, y, w, h) = [v * size for v in f]
-                cv2.rectangle(im, (x,y), (x+w,y+h), (0,255,0), 4)
-                sub_face = im[y:y+h, x:x+w]
-                
-                face_file = "test.jpg"
-                cv2.imwrite(face_file, sub_face)
-                
-                text = self.predict_emotion(face_file)
-                emotion_code = self.emotion_dict.get(text.lower(), '3')
-                self.predictions.append(emotion_code)
-                
-                font = cv2.FONT_HERSHEY_TRIPLEX
-                cv2.putText(im, emotion_code, (x+w, y), font, 1, (0,0,255), 1)
-                
-            cv2.imshow('Facial Emotion Detection', im)
-            key = cv2.waitKey(10)
-            if key == 27:  # ESC key
-                break
-                
-        webcam.release()
-        cv2.destroyAllWindows()
+    def detect_from_webcam(self, num_predictions=10, headless=False, track=True,
+                           detect_interval=10, source=0, timeout=None):
+        """
+        Detect emotion from webcam stream
+        Capture, face detection and inference run as a pipeline on separate
+        threads; headless=True skips all GUI calls. With track=True the Haar
+        cascade only runs every detect_interval frames and faces are followed
+        by template matching in between. source can be a camera index, video
+        file, image directory or recorded session (see frame_sources).
+        With a timeout (seconds) the vote is taken over the predictions
+        collected until then.
+        """
+        pipeline = WebcamEmotionPipeline(self, source=source, headless=headless, track=track,
+                                         detect_interval=detect_interval)
+        self.predictions = pipeline.run(num_predictions, timeout=timeout)
         
         if self.predictions:
             most_common = Counter(self.predictions).most_common(1)[0][0]
             return most_common
         return '3'  # neutral default
+        
+    def detect_from_webcam_adaptive(self, confidence=0.9, min_frames=3, max_frames=10,
+                                    headless=False, track=True, detect_interval=10, source=0,
+                                    timeout=None):
+        """
+        Detect emotion from webcam stream, stopping as soon as it is clear
+        Softmax outputs are accumulated by a SequentialEmotionVoter; returns
+        (emotion_code, confidence, frames_used). When the timeout (seconds)
+        expires first, the voter's current decision is returned.
+        """
+        voter = SequentialEmotionVoter(len(self.labels), confidence=confidence,
+                                       min_frames=min_frames, max_frames=max_frames)
+        pipeline = WebcamEmotionPipeline(self, source=source, headless=headless, track=track,
+                                         detect_interval=detect_interval)
+        self.predictions = pipeline.run(max_frames, voter=voter, timeout=timeout)
+        
+        if voter.frames == 0:
+            return '3', 0.0, 0  # neutral default
+        index, decision_confidence, frames_used = voter.decision()
+        emotion_code = self.emotion_dict.get(self.labels[index].lower(), '3')
+        return emotion_code, decision_confidence, frames_used
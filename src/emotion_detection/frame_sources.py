@@ -0,0 +1,199 @@
+"""
+Frame Sources
+Pluggable frame providers for the facial pipeline: live camera, video file,
+image directory or a recorded session. All sources follow the
+cv2.VideoCapture read()/release() protocol so they can replace it directly.
+"""
+import json
+import os
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+SESSION_MANIFEST = 'session.json'
+
+
+class FrameSource:
+    """Base class, subclasses implement read() -> (ok, frame)"""
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def isOpened(self):
+        return True
+
+    def __iter__(self):
+        while True:
+            ok, frame = self.read()
+            if not ok:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class CameraSource(FrameSource):
+    """
+    Live camera through cv2.VideoCapture
+    width/height request a capture resolution (the camera picks the nearest
+    mode it supports); mjpg=True asks for compressed MJPG frames, which lets
+    many USB cameras deliver that resolution at full frame rate.
+    """
+    def __init__(self, index=0, width=None, height=None, mjpg=False):
+        self.index = index
+        self.capture = cv2.VideoCapture(index)
+        if mjpg:
+            self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        if width:
+            self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    @property
+    def resolution(self):
+        """(width, height) the camera actually negotiated"""
+        return (int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def read(self):
+        return self.capture.read()
+
+    def release(self):
+        self.capture.release()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+
+class VideoFileSource(FrameSource):
+    """Frames decoded from a video file, optionally looped"""
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.capture = cv2.VideoCapture(path)
+
+    def read(self):
+        ok, frame = self.capture.read()
+        if not ok and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+        return ok, frame
+
+    def release(self):
+        self.capture.release()
+
+    def isOpened(self):
+        return self.capture.isOpened()
+
+
+class ImageDirectorySource(FrameSource):
+    """Each image in a directory (e.g. images/happy) served as one frame"""
+    def __init__(self, directory, loop=False):
+        self.directory = directory
+        self.loop = loop
+        self.files = sorted(
+            os.path.join(directory, name) for name in os.listdir(directory)
+            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.position = 0
+
+    def read(self):
+        while self.files:
+            if self.position >= len(self.files):
+                if not self.loop:
+                    return False, None
+                self.position = 0
+            path = self.files[self.position]
+            self.position += 1
+            frame = cv2.imread(path)
+            if frame is not None:
+                return True, frame
+            print(f"⚠️  Skipping unreadable image: {path}")
+        return False, None
+
+    def isOpened(self):
+        return bool(self.files)
+
+
+class RecordedSessionSource(FrameSource):
+    """
+    Replays a session written by SessionRecorder
+    With realtime=True frames are delivered at their original capture times.
+    """
+    def __init__(self, directory, realtime=False, loop=False):
+        self.directory = directory
+        self.realtime = realtime
+        self.loop = loop
+        with open(os.path.join(directory, SESSION_MANIFEST), 'r') as f:
+            self.frames = json.load(f)['frames']
+        self.position = 0
+        self._start = None
+
+    def read(self):
+        if self.position >= len(self.frames):
+            if not self.loop or not self.frames:
+                return False, None
+            self.position = 0
+            self._start = None
+        entry = self.frames[self.position]
+        self.position += 1
+
+        if self.realtime:
+            if self._start is None:
+                self._start = time.time() - entry['t']
+            delay = self._start + entry['t'] - time.time()
+            if delay > 0:
+                time.sleep(delay)
+
+        frame = cv2.imread(os.path.join(self.directory, entry['file']))
+        return frame is not None, frame
+
+    def isOpened(self):
+        return bool(self.frames)
+
+
+class SessionRecorder:
+    """Records frames from any source into a directory RecordedSessionSource can replay"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.frames = []
+        self._start = None
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame):
+        now = time.time()
+        if self._start is None:
+            self._start = now
+        name = "frame_%06d.png" % len(self.frames)  # lossless so replays are exact
+        cv2.imwrite(os.path.join(self.directory, name), frame)
+        self.frames.append({'file': name, 't': now - self._start})
+
+    def close(self):
+        with open(os.path.join(self.directory, SESSION_MANIFEST), 'w') as f:
+            json.dump({'frames': self.frames}, f, indent=2)
+
+
+def open_frame_source(spec=0, loop=False, realtime=False, width=None, height=None, mjpg=False):
+    """
+    Open a frame source from a spec:
+    camera index (int or digit string), video file, image directory,
+    or a recorded session directory (contains session.json).
+    width/height/mjpg only apply to cameras.
+    """
+    if isinstance(spec, FrameSource):
+        return spec
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.isdigit()):
+        return CameraSource(int(spec), width=width, height=height, mjpg=mjpg)
+    if os.path.isdir(spec):
+        if os.path.exists(os.path.join(spec, SESSION_MANIFEST)):
+            return RecordedSessionSource(spec, realtime=realtime, loop=loop)
+        return ImageDirectorySource(spec, loop=loop)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, loop=loop)
+    raise ValueError(f"Unknown frame source: {spec}")
@@ -0,0 +1,234 @@
+"""
+Shared Facial Inference Worker
+A long-lived local process that keeps one facial model warm and serves
+softmax predictions to any number of clients (label.py, the multimodal
+player, batch tools) over a Unix socket, micro-batching across clients.
+
+The socket and a shared secret (authkey) live in a private per-user
+directory, $XDG_RUNTIME_DIR/syncin or ~/.syncin (mode 0700). Every
+connection must authenticate with the authkey before any message is
+unpickled, on Unix sockets and on the localhost TCP fallback alike.
+
+Start it with:
+    python -m src.emotion_detection.inference_worker
+"""
+import argparse
+import os
+import secrets
+import socket
+import stat
+import threading
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from .micro_batching import MicroBatcher
+
+RUNTIME_DIR = os.path.join(os.environ['XDG_RUNTIME_DIR'], 'syncin') \
+    if os.environ.get('XDG_RUNTIME_DIR') else os.path.join(os.path.expanduser('~'), '.syncin')
+AUTHKEY_FILE = os.path.join(RUNTIME_DIR, 'facial_inference.key')
+
+if hasattr(socket, 'AF_UNIX'):
+    DEFAULT_ADDRESS = os.path.join(RUNTIME_DIR, 'facial_inference.sock')
+    DEFAULT_FAMILY = 'AF_UNIX'
+else:
+    DEFAULT_ADDRESS = ('127.0.0.1', 6123)
+    DEFAULT_FAMILY = 'AF_INET'
+
+
+def check_private(path):
+    """Raise PermissionError unless path is owned by this user and closed to others"""
+    info = os.stat(path)
+    if hasattr(os, 'getuid') and (info.st_uid != os.getuid() or info.st_mode & 0o077):
+        raise PermissionError(f"{path} must be owned by the current user with no group/other access")
+
+
+def ensure_runtime_dir():
+    """Create the private runtime directory (0700) if needed and verify it"""
+    os.makedirs(RUNTIME_DIR, mode=0o700, exist_ok=True)
+    check_private(RUNTIME_DIR)
+
+
+def load_authkey(create=False):
+    """
+    Read the worker's authkey; with create=True a random one is generated
+    (in a 0600 file) on first run. Raises FileNotFoundError if there is none.
+    """
+    if create:
+        ensure_runtime_dir()
+        try:
+            fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(secrets.token_bytes(32))
+    check_private(RUNTIME_DIR)
+    check_private(AUTHKEY_FILE)
+    with open(AUTHKEY_FILE, 'rb') as f:
+        authkey = f.read()
+    if not authkey:
+        raise PermissionError(f"{AUTHKEY_FILE} is empty")
+    return authkey
+
+
+class FacialInferenceServer:
+    """
+    Serves FacialEmotionDetector.predict_batch to local clients
+    authkey defaults to the per-user key file, created on first run.
+    """
+    def __init__(self, detector, address=DEFAULT_ADDRESS, authkey=None,
+                 max_batch_size=16, max_wait=0.005):
+        self.detector = detector
+        self.address = address
+        self.authkey = authkey or load_authkey(create=True)
+        self.batcher = MicroBatcher(self._predict, max_batch_size=max_batch_size,
+                                    max_wait=max_wait)
+        self.listener = None
+        self._next_client = 0
+
+    def _predict(self, items):
+        crops = [crop for crop, _ in items]
+        face_ids = [face_id for _, face_id in items]
+        probs, hits = self.detector.predict_batch(crops, face_ids, return_hits=True)
+        return list(zip(probs, hits))
+
+    def serve_forever(self):
+        """Accept clients until interrupted"""
+        family = 'AF_UNIX' if isinstance(self.address, str) else 'AF_INET'
+        if family == 'AF_UNIX':
+            ensure_runtime_dir()
+            if os.path.exists(self.address):
+                if not stat.S_ISSOCK(os.lstat(self.address).st_mode):
+                    raise FileExistsError(f"{self.address} exists and is not a socket")
+                os.remove(self.address)  # stale socket from a previous run
+        # Clients authenticate before any request is unpickled
+        self.listener = Listener(self.address, family=family, authkey=self.authkey)
+        if family == 'AF_UNIX':
+            os.chmod(self.address, 0o600)  # only the current user may connect
+        print(f"🧠 Facial inference worker listening on {self.address}")
+
+        try:
+            while True:
+                conn = self.listener.accept()
+                client_id = self._next_client
+                self._next_client += 1
+                threading.Thread(target=self._handle, args=(conn, client_id), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.listener is not None:
+            self.listener.close()
+            self.listener = None
+        self.batcher.close()
+
+    def _handle(self, conn, client_id):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                op = request[0]
+                try:
+                    if op == 'predict':
+                        _, crops, face_ids = request[:3]
+                        return_hits = len(request) > 3 and request[3]
+                        if face_ids is None:
+                            face_ids = [None] * len(crops)
+                        # Face IDs are only unique per client
+                        items = [(crop, (client_id, face_id) if face_id is not None else None)
+                                 for crop, face_id in zip(crops, face_ids)]
+                        results = self.batcher.map(items)
+                        probs = np.stack([p for p, _ in results]) if results else \
+                            np.zeros((0, len(self.detector.labels)), dtype=np.float32)
+                        hits = np.array([h for _, h in results], dtype=bool)
+                        conn.send(('ok', (probs, hits) if return_hits else probs))
+                    elif op == 'labels':
+                        conn.send(('ok', list(self.detector.labels)))
+                    elif op == 'stats':
+                        stats = self.batcher.stats()
+                        if self.detector.prediction_cache is not None:
+                            stats['cache'] = self.detector.prediction_cache.stats()
+                        conn.send(('ok', stats))
+                    else:
+                        conn.send(('error', f"unknown request: {op}"))
+                except Exception as e:
+                    conn.send(('error', str(e)))
+
+
+class FacialInferenceClient:
+    """
+    Client for a running FacialInferenceServer
+    Raises OSError (e.g. FileNotFoundError, ConnectionRefusedError, or
+    PermissionError for a runtime directory not private to this user) if
+    no trusted worker is listening, so callers can fall back to a local
+    model. The connection is authenticated with the per-user authkey
+    before anything is unpickled.
+    """
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None):
+        family = 'AF_UNIX' if isinstance(address, str) else 'AF_INET'
+        if authkey is None:
+            authkey = load_authkey()
+        if family == 'AF_UNIX':
+            check_private(os.path.dirname(os.path.abspath(address)))
+        try:
+            self.conn = Client(address, family=family, authkey=authkey)
+        except EOFError as e:
+            raise ConnectionRefusedError(f"Inference worker at {address} closed the connection") from e
+        self._lock = threading.Lock()
+        self.labels = self._call('labels')
+
+    def _call(self, *request):
+        with self._lock:
+            self.conn.send(request)
+            status, payload = self.conn.recv()
+        if status != 'ok':
+            raise RuntimeError(f"Inference worker error: {payload}")
+        return payload
+
+    def predict_batch(self, crops, face_ids=None, return_hits=False):
+        """
+        Return an (N, num_labels) softmax array for a list of BGR face crops,
+        plus a boolean array of rows reused from the worker's cache if return_hits
+        """
+        return self._call('predict', [np.ascontiguousarray(c) for c in crops], face_ids,
+                          return_hits)
+
+    def label_for(self, probs):
+        return self.labels[int(np.argmax(probs))]
+
+    def stats(self):
+        """Batching and cache statistics of the worker"""
+        return self._call('stats')
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared facial emotion inference worker")
+    parser.add_argument('--address', default=DEFAULT_ADDRESS if DEFAULT_FAMILY == 'AF_UNIX' else None,
+                        help="Unix socket path (default: in the private runtime directory)")
+    parser.add_argument('--model', default='retrained_graph.pb')
+    parser.add_argument('--labels', default='retrained_labels.txt')
+    parser.add_argument('--runtime', choices=['graph', 'function', 'tflite'], default='graph')
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    from .facial_emotion import FacialEmotionDetector
+    detector = FacialEmotionDetector(model_file=args.model, label_file=args.labels,
+                                     runtime=args.runtime)
+    server = FacialInferenceServer(detector, address=args.address or DEFAULT_ADDRESS,
+                                   max_batch_size=args.max_batch_size,
+                                   max_wait=args.max_wait_ms / 1000.0)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Inference worker stopped")
+
+
+if __name__ == '__main__':
+    main()
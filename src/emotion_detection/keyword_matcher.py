@@ -0,0 +1,120 @@
+"""
+Keyword Matcher
+Compiled single-pass lexicon matching for the rule-based text fallback
+"""
+import csv
+import re
+
+# Words that negate the emotion terms following them
+NEGATIONS = ('not', 'no', 'never', 'nothing', 'none', 'nobody', 'without', 'hardly',
+             "don't", "doesn't", "didn't", "isn't", "wasn't", "aren't", "weren't",
+             "can't", "cannot", "couldn't", "won't", "wouldn't", "shouldn't", "ain't")
+
+# Where a negated term's weight goes; emotions not listed are dropped
+NEGATION_MAP = {'happy': 'sad'}
+
+# Words (with internal apostrophes) and clause punctuation, which ends a negation
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)*|[.,;:!?]")
+
+DEFAULT_PROBABILITIES = {'neutral': 0.8, 'happy': 0.1, 'sad': 0.05, 'angry': 0.05}
+
+
+def load_lexicon(path):
+    """
+    Read a term,emotion[,weight] CSV into a {emotion: {term: weight}} lexicon
+    Lines starting with # are ignored.
+    """
+    lexicon = {}
+    with open(path, 'r', newline='') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#'):
+                continue
+            term, emotion = row[0], row[1]
+            weight = float(row[2]) if len(row) > 2 and row[2] else 1.0
+            lexicon.setdefault(emotion.strip(), {})[term.strip()] = weight
+    return lexicon
+
+
+class KeywordMatcher:
+    """
+    Scores text against a weighted emotion lexicon in one pass
+
+    The lexicon ({emotion: [terms]} or {emotion: {term: weight}}) is compiled
+    once into a hash table keyed by token tuples, so each token of the text
+    costs a few dictionary lookups however many terms there are. Terms match
+    whole words only ("mad" does not match "made"); multi-word terms match
+    longest first; a trailing "s" is tried as a fallback so "hates" finds
+    "hate". A negation word flips or drops the matches in the next
+    negation_window tokens, up to the end of the clause.
+    """
+    def __init__(self, lexicon, negations=NEGATIONS, negation_window=3,
+                 negation_map=NEGATION_MAP, default=DEFAULT_PROBABILITIES):
+        self.emotions = list(lexicon)
+        self.negations = frozenset(negations)
+        self.negation_window = negation_window
+        self.negation_map = dict(negation_map)
+        self.default = dict(default)
+        self.terms = {}
+        self.max_words = 1
+        for emotion, terms in lexicon.items():
+            if not isinstance(terms, dict):
+                terms = {term: 1.0 for term in terms}
+            for term, weight in terms.items():
+                key = tuple(TOKEN_PATTERN.findall(term.lower()))
+                if not key:
+                    continue
+                self.terms.setdefault(key, []).append((emotion, float(weight)))
+                self.max_words = max(self.max_words, len(key))
+
+    def tokenize(self, text):
+        return TOKEN_PATTERN.findall(text.lower().replace('’', "'"))
+
+    def _lookup(self, tokens, i):
+        """Longest lexicon term starting at tokens[i], returns (entries, length)"""
+        for n in range(min(self.max_words, len(tokens) - i), 0, -1):
+            key = tuple(tokens[i:i + n])
+            entries = self.terms.get(key)
+            if entries is None and key[-1].endswith('s'):
+                entries = self.terms.get(key[:-1] + (key[-1][:-1],))
+            if entries is not None:
+                return entries, n
+        return None, 1
+
+    def scores(self, text):
+        """Summed term weights per emotion"""
+        scores = {emotion: 0.0 for emotion in self.emotions}
+        tokens = self.tokenize(text)
+        negated_until = -1
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in self.negations:
+                negated_until = i + self.negation_window
+                i += 1
+                continue
+            if len(token) == 1 and not token.isalnum():
+                negated_until = -1  # clause boundary
+                i += 1
+                continue
+            entries, n = self._lookup(tokens, i)
+            if entries is not None:
+                negated = i <= negated_until
+                for emotion, weight in entries:
+                    if negated:
+                        emotion = self.negation_map.get(emotion)
+                        if emotion is None:
+                            continue
+                    scores[emotion] = scores.get(emotion, 0.0) + weight
+            i += n
+        return scores
+
+    def probabilities(self, text):
+        """Normalized scores, or the default distribution if nothing matched"""
+        scores = {k: max(v, 0.0) for k, v in self.scores(text).items()}
+        total = sum(scores.values())
+        if total <= 0:
+            return dict(self.default)
+        return {k: v / total for k, v in scores.items()}
+
+    def probabilities_batch(self, texts):
+        return [self.probabilities(text) for text in texts]
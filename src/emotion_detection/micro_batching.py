@@ -0,0 +1,99 @@
+"""
+Micro-batching
+Groups requests from concurrent callers into small batches for one model call
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from any thread and runs them through
+    process_fn(list_of_items) -> list_of_results on a background thread.
+    A batch is dispatched when it holds max_batch_size items or when the
+    first item has waited max_wait seconds, whichever comes first.
+    """
+    def __init__(self, process_fn, max_batch_size=16, max_wait=0.005):
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.items = 0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """Queue one item, returns a concurrent.futures.Future for its result"""
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def map(self, items):
+        """Submit several items and wait for all of their results"""
+        futures = [self.submit(item) for item in items]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Process what is already queued, then stop the worker thread"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+
+    @property
+    def occupancy(self):
+        """Average fraction of max_batch_size filled per dispatched batch"""
+        if self.batches == 0:
+            return 0.0
+        return self.items / float(self.batches * self.max_batch_size)
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / float(self.batches) if self.batches else 0.0,
+            'occupancy': self.occupancy,
+            'max_batch_size': self.max_batch_size,
+            'max_wait': self.max_wait
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+        try:
+            results = self.process_fn(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
@@ -0,0 +1,116 @@
+"""
+Facial Prediction Cache
+Reuses the last softmax for a face whose crop has not meaningfully changed
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+def crop_hash(crop, hash_size=8):
+    """64-bit difference hash (dHash) of a BGR face crop"""
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    """Number of differing bits between two hashes"""
+    return bin(a ^ b).count('1')
+
+
+class PredictionCache:
+    """
+    Bounded LRU cache of softmax vectors keyed by tracked face ID
+
+    A lookup hits when the stored crop hash for the same face is within
+    max_distance bits of the new crop's hash. Crops without a face ID are
+    not cached, since a near-identical hash of an unrelated face would return
+    its softmax; anonymous=True matches them against the other anonymous
+    entries instead (only safe for a single face in a static scene). An
+    entry is recomputed after max_reuse consecutive hits so slow expression
+    drift is still picked up.
+    """
+    def __init__(self, max_entries=32, max_distance=6, max_reuse=30, hash_size=8,
+                 anonymous=False):
+        self.anonymous = anonymous
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_reuse = max_reuse
+        self.hash_size = hash_size
+        self.entries = OrderedDict()  # key -> [hash, probs, reuse_count]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._anonymous = 0
+
+    def lookup(self, crop, face_id=None):
+        """Return (probs or None, crop hash); pass the hash back to store() on a miss"""
+        if face_id is None and not self.anonymous:
+            return None, None  # uncacheable, not counted as a miss
+        h = crop_hash(crop, self.hash_size)
+        with self._lock:
+            key = self._find(h, face_id)
+            if key is not None:
+                entry = self.entries[key]
+                if entry[2] < self.max_reuse:
+                    entry[2] += 1
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1], h
+            self.misses += 1
+            return None, h
+
+    def store(self, h, probs, face_id=None):
+        """Remember the softmax computed for a crop with hash h"""
+        if h is None or (face_id is None and not self.anonymous):
+            return
+        with self._lock:
+            key = ('face', face_id) if face_id is not None else self._find(h, None)
+            if key is None:
+                key = ('anon', self._anonymous)
+                self._anonymous += 1
+            self.entries[key] = [h, np.array(probs, copy=True), 0]
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def _find(self, h, face_id):
+        if face_id is not None:
+            key = ('face', face_id)
+            entry = self.entries.get(key)
+            if entry is not None and hamming(entry[0], h) <= self.max_distance:
+                return key
+            return None
+        best, best_distance = None, self.max_distance
+        for key, entry in self.entries.items():
+            if key[0] != 'anon':
+                continue
+            distance = hamming(entry[0], h)
+            if distance <= best_distance:
+                best, best_distance = key, distance
+        return best
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """Hit/miss/eviction counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'hit_rate': self.hit_rate
+        }
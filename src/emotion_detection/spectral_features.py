@@ -0,0 +1,85 @@
+"""
+Spectral Feature Engine
+Computes one STFT per clip and derives every voice feature from it
+"""
+from functools import lru_cache
+
+import librosa
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def mel_filterbank(sample_rate, n_fft, n_mels=128):
+    """Mel filter matrix, built once per (sample_rate, n_fft, n_mels)"""
+    filters = librosa.filters.mel(sr=sample_rate, n_fft=n_fft, n_mels=n_mels)
+    filters.flags.writeable = False
+    return filters
+
+
+@lru_cache(maxsize=16)
+def chroma_filterbank(sample_rate, n_fft, n_chroma=12):
+    """Chroma projection matrix, built once per (sample_rate, n_fft, n_chroma)"""
+    filters = librosa.filters.chroma(sr=sample_rate, n_fft=n_fft, n_chroma=n_chroma)
+    filters.flags.writeable = False
+    return filters
+
+
+class SpectralFeatureEngine:
+    """
+    Shared-STFT voice feature extraction
+
+    librosa.feature.mfcc, spectral_centroid, spectral_rolloff and chroma_stft
+    each recompute the STFT of the clip when given raw audio. This engine
+    computes the magnitude spectrogram once and feeds it (or its power) to
+    every spectral feature. Chroma uses a cached filter matrix at A440
+    tuning instead of estimating the tuning of every clip.
+    """
+    def __init__(self, sample_rate=22050, n_fft=2048, hop_length=512, n_mfcc=40, n_mels=128):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop_length = hop_length
+        self.n_mfcc = n_mfcc
+        self.n_mels = n_mels
+
+    def magnitude(self, audio_data):
+        """|STFT| of the clip, shape (1 + n_fft/2, frames)"""
+        return np.abs(librosa.stft(audio_data, n_fft=self.n_fft, hop_length=self.hop_length))
+
+    def compute(self, audio_data, magnitude=None):
+        """Return a dict of clip-level features computed from a single STFT"""
+        if magnitude is None:
+            magnitude = self.magnitude(audio_data)
+        power = magnitude ** 2
+
+        mel = np.dot(mel_filterbank(self.sample_rate, self.n_fft, self.n_mels), power)
+        mfccs = librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=self.n_mfcc)
+
+        centroid = librosa.feature.spectral_centroid(S=magnitude, sr=self.sample_rate,
+                                                     n_fft=self.n_fft)
+        rolloff = librosa.feature.spectral_rolloff(S=magnitude, sr=self.sample_rate,
+                                                   n_fft=self.n_fft)
+
+        chroma = np.dot(chroma_filterbank(self.sample_rate, self.n_fft), power)
+        chroma = librosa.util.normalize(chroma, norm=np.inf, axis=0)
+
+        # Time-domain features are cheaper than any spectral route
+        zcr = librosa.feature.zero_crossing_rate(audio_data, frame_length=self.n_fft,
+                                                 hop_length=self.hop_length)
+
+        return {
+            'mfcc_mean': np.mean(mfccs, axis=1),
+            'zcr': float(np.mean(zcr)),
+            'spectral_centroid': float(np.mean(centroid)),
+            'spectral_rolloff': float(np.mean(rolloff)),
+            'chroma': float(np.mean(chroma)),
+            'energy': float(np.mean(np.abs(audio_data)))
+        }
+
+    @staticmethod
+    def to_vector(features):
+        """Flatten a feature dict into the 44-value vector used by extract_features"""
+        return np.concatenate([
+            features['mfcc_mean'],
+            [features['zcr'], features['spectral_centroid'],
+             features['spectral_rolloff'], features['chroma']]
+        ])
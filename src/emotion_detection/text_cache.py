@@ -0,0 +1,85 @@
+"""
+Text Result Cache
+Reuses model predictions for repeated or templated text inputs
+"""
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(text):
+    """Unicode-normalized, case-folded text with collapsed whitespace"""
+    return WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text)).strip().casefold()
+
+
+class TextResultCache:
+    """
+    Bounded LRU cache of emotion distributions keyed by normalized text
+
+    Keys are SHA-1 digests of the normalized text, so long inputs cost a
+    fixed amount of memory. Entries older than ttl seconds (if set) are
+    treated as misses and dropped.
+    """
+    def __init__(self, max_entries=256, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (stored_at, probs)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text):
+        return hashlib.sha1(normalize_text(text).encode('utf-8')).digest()
+
+    def get(self, text):
+        """Return a copy of the cached distribution for text, or None"""
+        key = self.key(text)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl is not None and time.time() - entry[0] > self.ttl:
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, text, probs):
+        key = self.key(text)
+        with self._lock:
+            self.entries[key] = (time.time(), dict(probs))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """Hit/miss/eviction/expiration counters"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'entries': len(self.entries),
+            'hit_rate': self.hit_rate
+        }
@@ -2,21 +2,63 @@
 Text Emotion Recognition Module
 Analyzes emotions from text using NLP
 """
-from transformers import pipeline
+import itertools
+import threading
+import time
+
 import numpy as np
 
+from .keyword_matcher import DEFAULT_PROBABILITIES, KeywordMatcher, load_lexicon
+from .micro_batching import MicroBatcher
+from .text_cache import TextResultCache
+
+TEXT_MODEL = "j-hartmann/emotion-english-distilroberta-base"
+
 class TextEmotionDetector:
-    def __init__(self):
-        try:
-            # Use emotion classification model
-            self.classifier = pipeline("text-classification", 
-                                      model="j-hartmann/emotion-english-distilroberta-base",
-                                      return_all_scores=True)
-            self.model_loaded = True
-        except Exception as e:
-            print(f"⚠️  Could not load transformer model: {e}")
-            print("💡 Using rule-based text analysis instead")
-            self.model_loaded = False
+    def __init__(self, background=True, batch_size=8, micro_batching=False,
+                 max_batch_size=16, max_wait=0.005, lexicon_file=None,
+                 cache_size=256, cache_ttl=None, max_tokens=512, runtime='pipeline',
+                 model=TEXT_MODEL, num_threads=None, local_files_only=False):
+        """
+        The transformer model is loaded on a background thread by default so
+        construction returns immediately; until it is ready (or if it fails
+        to load) predictions come from the keyword-based analyzer.
+        batch_size is the forward-pass size of get_emotion_probabilities_batch.
+        With micro_batching=True, concurrent get_emotion_probabilities calls
+        are grouped (up to max_batch_size texts or max_wait seconds) into one
+        batched call. lexicon_file adds weighted term,emotion,weight rows to
+        the keyword fallback.
+        Model results are cached per normalized text (cache_size=0 disables
+        the cache); texts longer than max_tokens are scored in chunks.
+        runtime='quantized' runs a dynamically int8-quantized copy of the
+        model (see text_runtime); model may be a local directory, and
+        local_files_only=True keeps loading offline.
+        """
+        self.runtime = runtime
+        self.model_name = model
+        self.num_threads = num_threads
+        self.local_files_only = local_files_only
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.cache = TextResultCache(cache_size, cache_ttl) if cache_size else None
+        self.batcher = None
+        if micro_batching:
+            self.batcher = MicroBatcher(self.get_emotion_probabilities_batch,
+                                        max_batch_size=max_batch_size, max_wait=max_wait)
+        self.classifier = None
+        self.model_loaded = False
+        self.load_error = None
+        self.load_seconds = None
+        self.fallback_predictions = 0
+        self.model_predictions = 0
+        self._ready = threading.Event()
+        self._load_started = time.time()
+        if background:
+            self._loader = threading.Thread(target=self._load_model, daemon=True)
+            self._loader.start()
+        else:
+            self._loader = None
+            self._load_model()
             
         # Emotion keywords for rule-based fallback
         self.emotion_keywords = {
@@ -25,66 +67,197 @@ class TextEmotionDetector:
             'sad': ['sad', 'depressed', 'unhappy', 'miserable', 'crying', 'hurt'],
             'neutral': ['okay', 'fine', 'normal', 'alright']
         }
+        lexicon = {emotion: dict.fromkeys(terms, 1.0)
+                   for emotion, terms in self.emotion_keywords.items()}
+        if lexicon_file:
+            for emotion, terms in load_lexicon(lexicon_file).items():
+                lexicon.setdefault(emotion, {}).update(terms)
+        self.keyword_matcher = KeywordMatcher(lexicon)
+        
+    def _load_model(self):
+        try:
+            # Importing transformers pulls in torch, so it is deferred to here too
+            from .text_runtime import load_text_classifier
+            
+            # Use emotion classification model
+            self.classifier = load_text_classifier(self.model_name, self.runtime,
+                                                   self.num_threads, self.local_files_only)
+            self.model_loaded = True
+        except Exception as e:
+            self.load_error = str(e)
+            print(f"⚠️  Could not load transformer model: {e}")
+            print("💡 Using rule-based text analysis instead")
+        finally:
+            self.load_seconds = time.time() - self._load_started
+            self._ready.set()
+            
+    @property
+    def is_ready(self):
+        """True once the model has finished loading (or failed to)"""
+        return self._ready.is_set()
+        
+    def wait_until_ready(self, timeout=None):
+        """Block until loading has finished, returns whether the model is usable"""
+        self._ready.wait(timeout)
+        return self.model_loaded
+        
+    def load_status(self):
+        """Readiness and load-time metrics"""
+        if not self.is_ready:
+            state = 'loading'
+        else:
+            state = 'ready' if self.model_loaded else 'failed'
+        return {
+            'state': state,
+            'load_seconds': self.load_seconds,
+            'loading_for': None if self.is_ready else time.time() - self._load_started,
+            'error': self.load_error,
+            'model_predictions': self.model_predictions,
+            'fallback_predictions': self.fallback_predictions
+        }
         
     def analyze_text_simple(self, text):
         """Simple keyword-based emotion analysis"""
-        text_lower = text.lower()
-        scores = {emotion: 0 for emotion in self.emotion_keywords}
+        return self.keyword_matcher.probabilities(text)
         
-        for emotion, keywords in self.emotion_keywords.items():
-            for keyword in keywords:
-                if keyword in text_lower:
-                    scores[emotion] += 1
-                    
-        # Normalize scores
-        total = sum(scores.values())
-        if total == 0:
-            return {'neutral': 0.8, 'happy': 0.1, 'sad': 0.05, 'angry': 0.05}
+    def analyze_text_simple_batch(self, texts):
+        """Keyword-based emotion analysis for a list of texts"""
+        return self.keyword_matcher.probabilities_batch(texts)
         
-        probs = {k: v/total for k, v in scores.items()}
-        return probs
+    def map_model_scores(self, results):
+        """Convert one text's model scores to our emotion format"""
+        probs = {}
+        for item in results:
+            label = item['label'].lower()
+            score = item['score']
+            
+            # Map model labels to our emotions
+            if label in ['joy', 'happy']:
+                probs['happy'] = score
+            elif label in ['anger', 'angry']:
+                probs['angry'] = score
+            elif label in ['sadness', 'sad']:
+                probs['sad'] = score
+            elif label in ['neutral']:
+                probs['neutral'] = score
+            elif label in ['fear', 'surprise', 'disgust']:
+                # Distribute these to existing emotions
+                probs['neutral'] = probs.get('neutral', 0) + score/3
+                
+        # Ensure all emotions have values
+        for emotion in ['angry', 'happy', 'sad', 'neutral']:
+            if emotion not in probs:
+                probs[emotion] = 0.01
+                
+        # Normalize
+        total = sum(probs.values())
+        return {k: v/total for k, v in probs.items()}
         
     def get_emotion_probabilities(self, text):
         """Get emotion probabilities from text"""
-        if not text or len(text.strip()) == 0:
-            return {'neutral': 0.8, 'happy': 0.1, 'sad': 0.05, 'angry': 0.05}
-            
-        if self.model_loaded:
+        if self.batcher is not None:
+            return self.batcher.submit(text).result()
+        return self.get_emotion_probabilities_batch([text])[0]
+        
+    def get_emotion_probabilities_batch(self, texts):
+        """
+        Get emotion probabilities for a list of texts
+        Non-empty texts go through the model together in padded forward
+        passes of up to batch_size texts; cached texts skip the model and
+        texts longer than max_tokens are scored in chunks.
+        """
+        results = [None] * len(texts)
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or len(text.strip()) == 0:
+                results[i] = dict(DEFAULT_PROBABILITIES)
+            elif self.model_loaded and self.cache is not None:
+                results[i] = self.cache.get(text)
+                if results[i] is None:
+                    pending.append(i)
+            else:
+                pending.append(i)
+                
+        # Keywords answer until the background load has finished
+        if pending and self.model_loaded:
             try:
-                results = self.classifier(text)[0]
-                # Convert to our emotion format
-                probs = {}
-                for item in results:
-                    label = item['label'].lower()
-                    score = item['score']
-                    
-                    # Map model labels to our emotions
-                    if label in ['joy', 'happy']:
-                        probs['happy'] = score
-                    elif label in ['anger', 'angry']:
-                        probs['angry'] = score
-                    elif label in ['sadness', 'sad']:
-                        probs['sad'] = score
-                    elif label in ['neutral']:
-                        probs['neutral'] = score
-                    elif label in ['fear', 'surprise', 'disgust']:
-                        # Distribute these to existing emotions
-                        probs['neutral'] = probs.get('neutral', 0) + score/3
-                        
-                # Ensure all emotions have values
-                for emotion in ['angry', 'happy', 'sad', 'neutral']:
-                    if emotion not in probs:
-                        probs[emotion] = 0.01
-                        
-                # Normalize
-                total = sum(probs.values())
-                probs = {k: v/total for k, v in probs.items()}
-                return probs
+                long = {i for i in pending if self._is_long(texts[i])}
+                short = [i for i in pending if i not in long]
+                if short:
+                    outputs = self.classifier([texts[i] for i in short], batch_size=self.batch_size,
+                                              truncation=True)
+                    for i, scores in zip(short, outputs):
+                        results[i] = self.map_model_scores(scores)
+                for i in sorted(long):
+                    results[i] = self.get_emotion_probabilities_long(texts[i])
+                if self.cache is not None:
+                    for i in pending:
+                        self.cache.put(texts[i], results[i])
+                self.model_predictions += len(pending)
+                return results
             except Exception as e:
                 print(f"⚠️  Model prediction failed: {e}")
-                return self.analyze_text_simple(text)
-        else:
-            return self.analyze_text_simple(text)
+        for i, probs in zip(pending, self.analyze_text_simple_batch([texts[i] for i in pending])):
+            results[i] = probs
+        self.fallback_predictions += len(pending)
+        return results
+        
+    def _is_long(self, text):
+        # Byte-level BPE tokens cover at least one UTF-8 byte each (not one
+        # character: emoji and non-Latin text take several), so only texts
+        # with more bytes than the window need counting
+        if len(text.encode('utf-8')) <= self.max_tokens - 2:
+            return False
+        return len(self.classifier.tokenizer(text, add_special_tokens=False)['input_ids']) > \
+            self.max_tokens - 2
+        
+    def chunk_text(self, text):
+        """Yield (chunk, num_tokens) windows of at most max_tokens tokens"""
+        window = self.max_tokens - 2  # room for <s> and </s>
+        encoding = self.classifier.tokenizer(text, add_special_tokens=False,
+                                             return_offsets_mapping=True)
+        offsets = encoding['offset_mapping']
+        for start in range(0, len(offsets), window):
+            end = min(start + window, len(offsets))
+            yield text[offsets[start][0]:offsets[end - 1][1]], end - start
+            
+    def get_emotion_probabilities_long(self, text):
+        """
+        Score a text of any length with the model
+        Token-bounded chunks are streamed through the model batch_size at a
+        time and their distributions averaged, weighted by chunk length;
+        only running sums are kept between batches.
+        """
+        totals = {}
+        weight = 0
+        chunks = self.chunk_text(text)
+        while True:
+            batch = list(itertools.islice(chunks, self.batch_size))
+            if not batch:
+                break
+            outputs = self.classifier([chunk for chunk, _ in batch], batch_size=self.batch_size,
+                                      truncation=True)
+            for (_, n), scores in zip(batch, outputs):
+                for emotion, p in self.map_model_scores(scores).items():
+                    totals[emotion] = totals.get(emotion, 0.0) + p * n
+                weight += n
+        if weight == 0:
+            return dict(DEFAULT_PROBABILITIES)
+        return {k: v / weight for k, v in totals.items()}
+        
+    def cache_stats(self):
+        """Hit/miss counters of the result cache"""
+        return self.cache.stats() if self.cache is not None else None
+        
+    def batching_stats(self):
+        """Batch count, mean batch size and occupancy of the micro-batcher"""
+        return self.batcher.stats() if self.batcher is not None else None
+        
+    def close(self):
+        """Stop the micro-batcher, if any"""
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
             
     def detect_from_input(self, text=None):
         """Detect emotion from text input"""
@@ -0,0 +1,73 @@
+"""
+Text Model Runtimes
+Optimized CPU inference for the text emotion classifier
+"""
+import torch
+from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+
+class QuantizedTextClassifier:
+    """
+    Dynamically int8-quantized sequence classifier
+
+    Every nn.Linear is quantized with torch.quantization.quantize_dynamic
+    (weights int8, activations quantized on the fly), which is where nearly
+    all DistilRoBERTa CPU time goes. Texts are pre-tokenized with the fast
+    tokenizer a batch at a time, sorted by length so each batch pads to a
+    similar size. Calling it mirrors a text-classification pipeline with
+    return_all_scores=True: one [{'label', 'score'}, ...] list per text.
+    """
+    def __init__(self, model, local_files_only=False, quantize=True, max_length=512):
+        self.tokenizer = AutoTokenizer.from_pretrained(model, use_fast=True,
+                                                       local_files_only=local_files_only)
+        network = AutoModelForSequenceClassification.from_pretrained(
+            model, local_files_only=local_files_only)
+        network.eval()
+        if quantize:
+            network = torch.quantization.quantize_dynamic(network, {torch.nn.Linear},
+                                                          dtype=torch.qint8)
+        self.model = network
+        self.max_length = max_length
+        self.id2label = network.config.id2label
+
+    def __call__(self, texts, batch_size=8, truncation=True):
+        if isinstance(texts, str):
+            texts = [texts]
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            inputs = self.tokenizer([texts[i] for i in chunk], padding=True,
+                                    truncation=truncation, max_length=self.max_length,
+                                    return_tensors='pt')
+            with torch.inference_mode():
+                probs = torch.softmax(self.model(**inputs).logits, dim=-1).tolist()
+            for i, row in zip(chunk, probs):
+                results[i] = [{'label': self.id2label[j], 'score': score}
+                              for j, score in enumerate(row)]
+        return results
+
+
+def load_text_classifier(model, runtime='pipeline', num_threads=None, local_files_only=False):
+    """
+    Build a text classifier for TextEmotionDetector
+    runtime: 'pipeline' (float32 transformers pipeline), 'quantized'
+    (dynamic int8) or 'float' (same batched runner without quantization,
+    useful as a like-for-like baseline). model is a hub id or a local
+    directory (a cached snapshot or a small test checkpoint);
+    local_files_only=True never touches the network.
+    """
+    if num_threads:
+        torch.set_num_threads(num_threads)
+    if runtime == 'pipeline':
+        from transformers import pipeline
+        tokenizer = AutoTokenizer.from_pretrained(model, use_fast=True,
+                                                  local_files_only=local_files_only)
+        network = AutoModelForSequenceClassification.from_pretrained(
+            model, local_files_only=local_files_only)
+        return pipeline("text-classification", model=network, tokenizer=tokenizer,
+                        return_all_scores=True)
+    if runtime in ('quantized', 'float'):
+        return QuantizedTextClassifier(model, local_files_only=local_files_only,
+                                       quantize=runtime == 'quantized')
+    raise ValueError(f"Unknown text runtime: {runtime}")
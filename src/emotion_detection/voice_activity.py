@@ -0,0 +1,86 @@
+"""
+Voice Activity Detection
+Cheap energy/zero-crossing first pass that masks out non-speech frames
+"""
+import numpy as np
+
+
+class VoiceActivityDetector:
+    """
+    Frame-level energy/ZCR voice activity detector
+
+    A frame is voiced when its RMS energy clears an adaptive threshold
+    (noise floor plus a fraction of the clip's dynamic range, never below
+    min_energy), or when it is a quieter high-ZCR frame such as an unvoiced
+    fricative. The mask is widened by `hangover` frames on each side so word
+    onsets and endings are not clipped.
+    """
+    def __init__(self, sample_rate=22050, frame_length=512, hop_length=256,
+                 min_energy=0.005, relative_threshold=0.1, zcr_threshold=0.25,
+                 hangover=8, min_voiced=0.25):
+        self.sample_rate = sample_rate
+        self.frame_length = frame_length
+        self.hop_length = hop_length
+        self.min_energy = min_energy
+        self.relative_threshold = relative_threshold
+        self.zcr_threshold = zcr_threshold
+        self.hangover = hangover
+        # Less voiced audio than this (seconds) is treated as silence
+        self.min_voiced = min_voiced
+
+    def frames(self, audio_data):
+        """Strided (n_frames, frame_length) view of the clip, no copy"""
+        audio_data = np.asarray(audio_data, dtype=np.float32).reshape(-1)
+        if len(audio_data) < self.frame_length:
+            audio_data = np.pad(audio_data, (0, self.frame_length - len(audio_data)))
+        n_frames = 1 + (len(audio_data) - self.frame_length) // self.hop_length
+        stride = audio_data.strides[0]
+        return np.lib.stride_tricks.as_strided(
+            audio_data, shape=(n_frames, self.frame_length),
+            strides=(self.hop_length * stride, stride), writeable=False)
+
+    def frame_mask(self, audio_data):
+        """Boolean voiced/unvoiced decision per frame"""
+        frames = self.frames(audio_data)
+        rms = np.sqrt(np.mean(frames ** 2, axis=1))
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        noise_floor = np.percentile(rms, 10)
+        threshold = max(self.min_energy,
+                        noise_floor + self.relative_threshold * (rms.max() - noise_floor))
+        mask = (rms >= threshold) | ((rms >= 0.5 * threshold) & (zcr >= self.zcr_threshold))
+
+        if self.hangover and mask.any():
+            window = np.ones(2 * self.hangover + 1)
+            mask = np.convolve(mask, window, mode='same') > 0
+        return mask
+
+    def segments(self, mask, num_samples):
+        """Convert a frame mask into merged (start, end) sample ranges"""
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype(np.int8), [0]])))
+        segments = []
+        for first, last in zip(edges[::2], edges[1::2]):
+            start = first * self.hop_length
+            end = min((last - 1) * self.hop_length + self.frame_length, num_samples)
+            segments.append((start, end))
+        return segments
+
+    def voiced_audio(self, audio_data):
+        """
+        Return (voiced_samples, voiced_ratio)
+        voiced_samples concatenates the speech segments of the clip; it is
+        empty when less than min_voiced seconds of speech were found.
+        """
+        audio_data = np.asarray(audio_data).reshape(-1)
+        if len(audio_data) == 0:
+            return audio_data, 0.0
+        segments = self.segments(self.frame_mask(audio_data), len(audio_data))
+        voiced = sum(end - start for start, end in segments)
+        ratio = voiced / float(len(audio_data))
+        if voiced < self.min_voiced * self.sample_rate:
+            return audio_data[:0], ratio
+        if len(segments) == 1:
+            start, end = segments[0]
+            return audio_data[start:end], ratio
+        return np.concatenate([audio_data[start:end] for start, end in segments]), ratio
@@ -0,0 +1,288 @@
+"""
+Pipelined Webcam Emotion Engine
+Runs capture, face detection and emotion inference on separate threads
+"""
+import queue
+import threading
+import time
+
+import cv2
+
+from .face_tracking import FaceTracker
+from .frame_sources import CameraSource, ImageDirectorySource, open_frame_source
+
+# Passed through the stages once a finite frame source is exhausted
+END_OF_STREAM = object()
+
+
+class LatestQueue:
+    """
+    Bounded queue where a new item replaces the oldest one when full
+    With drop=False it is an ordinary blocking queue instead, for sources
+    where every frame matters (files, directories, recordings).
+    """
+    def __init__(self, maxsize=1, drop=True):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.drop = drop
+        self.dropped = 0
+
+    def put(self, item, stop=None):
+        """
+        Put an item, dropping stale items so the latest one always wins
+        (or, with drop=False, waiting for room until the stop event is set)
+        """
+        if not self.drop:
+            while stop is None or not stop.is_set():
+                try:
+                    self.queue.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        """Get the next item, raises queue.Empty on timeout"""
+        return self.queue.get(timeout=timeout)
+
+
+class WebcamEmotionPipeline:
+    """
+    Capture -> detect -> infer pipeline connected by bounded queues
+    Each stage runs on its own thread so slow inference never stalls capture;
+    for a live camera, older frames are dropped instead of queued when a
+    stage falls behind. Finite sources (video files, image directories,
+    recorded sessions) are processed frame by frame without dropping, and
+    an end-of-stream marker flushes the stages before the run ends. Image
+    directories are never tracked, since consecutive images are unrelated.
+
+    Cameras are asked for capture_size (MJPG where supported) instead of
+    their maximum resolution. The capture, detect and infer stages never
+    flip or copy a frame as a whole: detection runs on a downscaled copy and
+    only face regions are read at full resolution (and mirrored) for
+    inference. Only the GUI display mirrors the full frame it shows, on the
+    main thread; headless runs skip it.
+    """
+    def __init__(self, detector, source=0, downscale=4, queue_size=1,
+                 headless=False, window_name='Facial Emotion Detection',
+                 track=True, detect_interval=10, capture_size=(640, 480),
+                 mjpg=True, adaptive_downscale=True):
+        self.detector = detector
+        self.source = source
+        self.downscale = downscale
+        self.headless = headless
+        self.window_name = window_name
+        self.capture_size = capture_size
+        self.mjpg = mjpg
+        self.tracker = None
+        if track:
+            self.tracker = FaceTracker(detector.classifier, detect_interval=detect_interval,
+                                       downscale=downscale, adaptive=adaptive_downscale)
+
+        self.detect_queue = LatestQueue(queue_size)
+        self.infer_queue = LatestQueue(queue_size)
+        self.display_queue = LatestQueue(queue_size)
+
+        self.predictions = []
+        self.stats = {'captured': 0, 'detected': 0, 'inferred': 0, 'reused': 0}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._threads = []
+        self._target = 0
+        self.voter = None
+        self.webcam = None
+        self._tracking = track
+        self.timed_out = False
+        self.error = None
+
+    def start(self, num_predictions=10, voter=None):
+        """Open the frame source and start the pipeline threads"""
+        self.predictions = []
+        self._target = num_predictions
+        self.voter = voter
+        if voter is not None:
+            voter.reset()
+        self._stop.clear()
+        self._done.clear()
+        self.error = None
+        width, height = self.capture_size if self.capture_size else (None, None)
+        self.webcam = open_frame_source(self.source, width=width, height=height, mjpg=self.mjpg)
+        live = isinstance(self.webcam, CameraSource)
+        self.detect_queue.drop = live
+        self.infer_queue.drop = live
+        self._tracking = self.tracker is not None and \
+            not isinstance(self.webcam, ImageDirectorySource)
+        if self.tracker is not None:
+            self.tracker.reset()
+
+        stages = [self._capture_loop, self._detect_loop, self._infer_loop]
+        self._threads = [threading.Thread(target=self._run_stage, args=(stage,), daemon=True)
+                         for stage in stages]
+        for thread in self._threads:
+            thread.start()
+
+    def _run_stage(self, stage):
+        """Run one stage loop; an exception stops the whole pipeline and is kept for run()"""
+        try:
+            stage()
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            self._stop.set()
+
+    def stop(self):
+        """Stop all stages and release the frame source"""
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        if self.webcam is not None:
+            self.webcam.release()
+            self.webcam = None
+        if not self.headless:
+            cv2.destroyAllWindows()
+
+    def run(self, num_predictions=10, voter=None, timeout=None):
+        """
+        Run until num_predictions face predictions were collected or ESC is pressed
+        With a SequentialEmotionVoter the run ends as soon as the voter decides.
+        Softmax vectors reused from the prediction cache are displayed but not
+        counted as predictions or passed to the voter.
+        With a timeout (seconds) the run also ends when it expires, returning
+        the predictions collected so far; timed_out tells whether it did.
+        An exception raised in any stage stops the run and is re-raised here.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.timed_out = False
+        self.start(num_predictions, voter)
+        try:
+            if self.headless:
+                while not self._done.wait(timeout=0.1):
+                    if self._stop.is_set() or self._expired(deadline):
+                        break
+            else:
+                self._display_loop(deadline)
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+        return list(self.predictions)
+
+    def _expired(self, deadline):
+        if deadline is not None and time.monotonic() >= deadline:
+            self.timed_out = True
+        return self.timed_out
+
+    @property
+    def dropped(self):
+        """Frames dropped across all stages because a later stage was busy"""
+        return self.detect_queue.dropped + self.infer_queue.dropped
+
+    def _capture_loop(self):
+        frame_id = 0
+        while not self._stop.is_set():
+            (rval, im) = self.webcam.read()
+            if not rval:
+                self.detect_queue.put(END_OF_STREAM, self._stop)
+                break
+            self.stats['captured'] += 1
+            self.detect_queue.put((frame_id, time.time(), im), self._stop)
+            frame_id += 1
+
+    def _detect_loop(self):
+        size = self.downscale
+        while not self._stop.is_set():
+            try:
+                item = self.detect_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is END_OF_STREAM:
+                self.infer_queue.put(END_OF_STREAM, self._stop)
+                return
+            frame_id, timestamp, im = item
+            if self._tracking:
+                tracked = self.tracker.update(im)
+            else:
+                mini = cv2.resize(im, (int(im.shape[1]/size), int(im.shape[0]/size)))
+                faces = self.detector.classifier.detectMultiScale(mini)
+                tracked = [(None, tuple(int(v) * size for v in f)) for f in faces]
+
+            self.stats['detected'] += 1
+            if not tracked:
+                self.display_queue.put((im, []))
+                continue
+            self.infer_queue.put((frame_id, timestamp, im, tracked), self._stop)
+
+    def _infer_loop(self):
+        while not self._stop.is_set():
+            try:
+                item = self.infer_queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is END_OF_STREAM:
+                self._done.set()  # every frame of a finite source has been processed
+                return
+            frame_id, timestamp, im, tracked = item
+            tracked = [(face_id, (x, y, w, h)) for face_id, (x, y, w, h) in tracked
+                       if im[y:y+h, x:x+w].size]
+            if not tracked:
+                self.display_queue.put((im, []))
+                continue
+            boxes = [box for _, box in tracked]
+            # Mirror only the face regions, like the selfie view the model saw before
+            crops = [cv2.flip(im[y:y+h, x:x+w], 1) for (x, y, w, h) in boxes]
+            batch_probs, hits = self.detector.predict_batch(
+                crops, [face_id for face_id, _ in tracked], return_hits=True)
+            self.stats['inferred'] += 1
+
+            codes = []
+            for probs in batch_probs:
+                text = self.detector.label_for(probs)
+                codes.append(self.detector.emotion_dict.get(text.lower(), '3'))
+
+            with self._lock:
+                for probs, code, hit in zip(batch_probs, codes, hits):
+                    if self._done.is_set():
+                        break
+                    if hit:
+                        # A reused softmax is shown but is no new evidence for the vote
+                        self.stats['reused'] += 1
+                        continue
+                    self.predictions.append(code)
+                    if self.voter is not None:
+                        finished = self.voter.update(probs)
+                    else:
+                        finished = len(self.predictions) >= self._target
+                    if finished:
+                        self._done.set()
+
+            self.display_queue.put((im, list(zip(boxes, codes))))
+
+    def _display_loop(self, deadline=None):
+        font = cv2.FONT_HERSHEY_TRIPLEX
+        while not self._done.is_set() and not self._stop.is_set() and not self._expired(deadline):
+            try:
+                im, labelled = self.display_queue.get(timeout=0.01)
+            except queue.Empty:
+                im = None
+            if im is not None:
+                im = cv2.flip(im, 1)
+                frame_w = im.shape[1]
+                for (x, y, w, h), code in labelled:
+                    x = frame_w - x - w  # boxes are in unmirrored frame coordinates
+                    cv2.rectangle(im, (x,y), (x+w,y+h), (0,255,0), 4)
+                    cv2.putText(im, code, (x+w, y), font, 1, (0,0,255), 1)
+                cv2.imshow(self.window_name, im)
+            key = cv2.waitKey(10)
+            if key == 27:  # ESC key
+                break
@@ -0,0 +1,67 @@
+"""
+Batch Fusion Helpers
+Label index tables and array kernels for fusing many sessions at once
+"""
+from functools import lru_cache
+
+import numpy as np
+
+
+def label_shares(label):
+    """How a source label's probability is split over the standard emotions"""
+    label = label.lower()
+    if 'angry' in label or 'anger' in label:
+        return (('angry', 1.0),)
+    if 'happy' in label or 'joy' in label:
+        return (('happy', 1.0),)
+    if 'sad' in label:
+        return (('sad', 1.0),)
+    if 'neutral' in label:
+        return (('neutral', 1.0),)
+    # Distribute unknown emotions
+    return (('neutral', 0.5), ('sad', 0.5))
+
+
+@lru_cache(maxsize=64)
+def label_table(source_labels, target_labels):
+    """
+    (len(source_labels), len(target_labels)) projection matrix, built once
+    per label set; probs @ table maps source distributions onto targets
+    """
+    table = np.zeros((len(source_labels), len(target_labels)))
+    column = {label: j for j, label in enumerate(target_labels)}
+    for i, label in enumerate(source_labels):
+        for target, share in label_shares(label):
+            table[i, column[target]] += share
+    table.flags.writeable = False
+    return table
+
+
+def normalize_rows(probs):
+    """Rows scaled to sum to 1 along the last axis; all-zero rows become uniform"""
+    totals = probs.sum(axis=-1, keepdims=True)
+    uniform = np.full_like(probs, 1.0 / probs.shape[-1])
+    return np.where(totals > 0, probs / np.where(totals > 0, totals, 1.0), uniform)
+
+
+def fuse_arrays(probs, weights, mask=None, missing='drop'):
+    """
+    Weighted fusion of an (n_sessions, n_modalities, n_emotions) tensor
+    weights broadcasts to (n_sessions, n_modalities). Masked-out modalities
+    are dropped from the average (missing='drop') or contribute a uniform
+    distribution (missing='uniform', like the dict-based fusion).
+    Returns the (n_sessions, n_emotions) fused distributions.
+    """
+    probs = normalize_rows(np.asarray(probs, dtype=np.float64))
+    n_sessions, n_modalities, _ = probs.shape
+    weights = np.broadcast_to(np.asarray(weights, dtype=np.float64),
+                              (n_sessions, n_modalities))
+    if mask is not None:
+        mask = np.broadcast_to(np.asarray(mask, dtype=bool), (n_sessions, n_modalities))
+        if missing == 'drop':
+            weights = weights * mask
+        else:
+            probs = np.where(mask[..., None], probs, 1.0 / probs.shape[-1])
+
+    fused = np.einsum('sm,sme->se', weights, probs)
+    return normalize_rows(fused)
@@ -0,0 +1,121 @@
+"""
+Late Fusion Coordinator
+Fuses whichever modalities have reported by a deadline
+"""
+import threading
+import time
+
+import numpy as np
+
+
+class FusionCoordinator:
+    """
+    Deadline-driven asynchronous late fusion
+
+    Detectors publish their emotion dicts whenever they finish (directly or
+    through run(), which calls a detector on a background thread). wait()
+    returns as soon as every modality has reported or failed, as soon as at
+    least min_modalities have reported and the fused top probability
+    reaches early_confidence, or at the deadline, whichever comes first.
+    Only received modalities are fused: their weights (confidences for the
+    attention method) are renormalized over what arrived instead of padding
+    the missing ones with a uniform distribution. Results that arrive after
+    the decision refine it and are passed to on_refine.
+    """
+    def __init__(self, fusion, modalities=('facial', 'audio', 'text'), deadline=20.0,
+                 early_confidence=0.7, min_modalities=2, on_refine=None):
+        self.fusion = fusion
+        self.modalities = tuple(modalities)
+        self.deadline = deadline
+        self.early_confidence = early_confidence
+        self.min_modalities = min_modalities
+        self.on_refine = on_refine
+        self.results = {}  # modality -> (probs, confidence, arrival seconds)
+        self.failed = set()
+        self.decision = None
+        self.decided_at = None
+        self.refined = None
+        self.start_time = time.monotonic()
+        self._cond = threading.Condition()
+
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def publish(self, modality, probs, confidence=None):
+        """Report a modality's emotion dict (None if the detector failed or was skipped)"""
+        if modality not in self.modalities:
+            raise ValueError(f"Unknown modality: {modality}")
+        with self._cond:
+            if probs:
+                if confidence is None:
+                    confidence = max(probs.values())
+                self.results[modality] = (dict(probs), confidence, self.elapsed())
+            else:
+                self.failed.add(modality)
+            self._cond.notify_all()
+            late = self.decision is not None and bool(probs)
+            if late:
+                self.refined = self._fuse(dict(self.results))
+                refined = self.refined
+        if late and self.on_refine is not None:
+            self.on_refine(modality, refined)
+
+    def run(self, modality, detect):
+        """
+        Call detect() on a daemon thread and publish what it returns:
+        an emotion dict, a (probs, confidence) tuple, or None
+        """
+        def target():
+            try:
+                result = detect()
+            except Exception as e:
+                print(f"   ⚠️  {modality.capitalize()} detection skipped: {e}")
+                result = None
+            if isinstance(result, tuple):
+                self.publish(modality, *result)
+            else:
+                self.publish(modality, result)
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        return thread
+
+    def _fuse(self, results):
+        labels = self.fusion.emotion_labels
+        if not results:
+            return {e: 1.0 / len(labels) for e in labels}
+        probs, mask = self.fusion.stack_sessions([{m: r[0] for m, r in results.items()}],
+                                                 self.modalities)
+        if self.fusion.fusion_method == 'attention':
+            weights = np.ones(len(self.modalities))
+            confidences = [results[m][1] if m in results else 0.0 for m in self.modalities]
+        else:
+            weights = [self.fusion.weights.get(m, 0.0) for m in self.modalities]
+            confidences = None
+        fused, _ = self.fusion.fuse_batch(probs, weights, confidences, mask)
+        return dict(zip(labels, fused[0].tolist()))
+
+    def _settled(self):
+        if len(self.results) + len(self.failed) >= len(self.modalities):
+            return True
+        if self.early_confidence is None or len(self.results) < self.min_modalities:
+            return False
+        return max(self._fuse(self.results).values()) >= self.early_confidence
+
+    def wait(self):
+        """Block until fusion can run, returns (fused probs, modalities used)"""
+        deadline = self.start_time + self.deadline
+        with self._cond:
+            while not self._settled():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            results = dict(self.results)
+            self.decision = self._fuse(results)
+            self.decided_at = self.elapsed()
+        return self.decision, [m for m in self.modalities if m in results]
+
+    def arrivals(self):
+        """Seconds from start until each received modality reported"""
+        with self._cond:
+            return {m: r[2] for m, r in self.results.items()}
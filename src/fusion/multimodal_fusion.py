@@ -4,6 +4,8 @@ Combines emotions from facial, audio, and text modalities
 """
 import numpy as np
 
+from .batch_fusion import fuse_arrays, label_shares, label_table
+
 class MultimodalFusion:
     def __init__(self, fusion_method='weighted_average'):
         self.fusion_method = fusion_method
@@ -30,19 +32,8 @@ class MultimodalFusion:
         normalized = {emotion: 0.0 for emotion in self.emotion_labels}
         
         for emotion, prob in emotion_dict.items():
-            emotion_lower = emotion.lower()
-            if 'angry' in emotion_lower or 'anger' in emotion_lower:
-                normalized['angry'] += prob
-            elif 'happy' in emotion_lower or 'joy' in emotion_lower:
-                normalized['happy'] += prob
-            elif 'sad' in emotion_lower:
-                normalized['sad'] += prob
-            elif 'neutral' in emotion_lower:
-                normalized['neutral'] += prob
-            else:
-                # Distribute unknown emotions
-                normalized['neutral'] += prob / 2
-                normalized['sad'] += prob / 2
+            for target, share in label_shares(emotion):
+                normalized[target] += prob * share
                 
         # Normalize to sum to 1
         total = sum(normalized.values())
@@ -119,6 +110,55 @@ class MultimodalFusion:
         else:
             return self.weighted_average_fusion(facial_probs, audio_probs, text_probs)
             
+    def stack_sessions(self, sessions, modalities=('facial', 'audio', 'text')):
+        """
+        Convert a list of per-session {modality: emotion dict or None} into
+        a (n_sessions, n_modalities, n_emotions) tensor and a presence mask
+        Each distinct label set is mapped through one cached index table.
+        """
+        probs = np.zeros((len(sessions), len(modalities), len(self.emotion_labels)))
+        mask = np.zeros((len(sessions), len(modalities)), dtype=bool)
+        target = tuple(self.emotion_labels)
+        for s, session in enumerate(sessions):
+            for m, modality in enumerate(modalities):
+                emotion_dict = session.get(modality)
+                if not emotion_dict:
+                    continue
+                source = tuple(emotion_dict)
+                values = np.fromiter(emotion_dict.values(), dtype=np.float64, count=len(source))
+                probs[s, m] = values @ label_table(source, target)
+                mask[s, m] = True
+        return probs, mask
+        
+    def fuse_batch(self, probs, weights=None, confidences=None, mask=None,
+                   source_labels=None, missing='drop'):
+        """
+        Vectorized fusion of many sessions at once
+
+        probs: (n_sessions, n_modalities, n_labels) array; its last axis is
+        in source_labels order if given (mapped through a cached index
+        table), else already in emotion_labels order.
+        weights: (n_modalities,) or (n_sessions, n_modalities), defaults to
+        self.weights for the facial/audio/text layout.
+        confidences: same shapes, multiplied into the weights.
+        mask: (n_sessions, n_modalities) presence mask; missing modalities
+        are dropped from the average ('drop') or count as uniform ('uniform',
+        what weighted_average_fusion does for a None input).
+        Returns (fused (n_sessions, n_emotions), dominant label array).
+        """
+        probs = np.asarray(probs, dtype=np.float64)
+        if source_labels is not None:
+            probs = probs @ label_table(tuple(source_labels), tuple(self.emotion_labels))
+        if weights is None:
+            weights = [self.weights['facial'], self.weights['audio'], self.weights['text']]
+        weights = np.asarray(weights, dtype=np.float64)
+        if confidences is not None:
+            weights = weights * np.asarray(confidences, dtype=np.float64)
+            
+        fused = fuse_arrays(probs, weights, mask, missing)
+        dominant = np.asarray(self.emotion_labels)[np.argmax(fused, axis=-1)]
+        return fused, dominant
+        
     def get_dominant_emotion(self, fused_probs):
         """Get the dominant emotion and its confidence"""
         emotion = max(fused_probs, key=fused_probs.get)
@@ -0,0 +1,160 @@
+"""
+Temporal Fusion
+Streaming, time-decayed fusion of per-modality observations
+"""
+import threading
+import time
+
+import numpy as np
+
+from .batch_fusion import label_table, normalize_rows
+
+
+class TemporalFusion:
+    """
+    Exponentially time-decayed running posterior over emotions
+
+    Each observation (a modality's emotion dict at a timestamp) is mapped
+    onto emotion_labels and added to a decayed evidence vector; evidence
+    loses half its weight every half_life seconds, so an update costs O(1)
+    however long the session runs. Observations are weighted like in
+    MultimodalFusion: by confidence for the attention method, by the
+    modality weight otherwise. A change event is raised when a different
+    emotion becomes dominant by at least `hysteresis` and at least
+    min_evidence (decayed) weight backs the posterior, but never within
+    min_dwell seconds of the previous change or of seed().
+    """
+    def __init__(self, fusion, half_life=10.0, hysteresis=0.05, min_evidence=0.5,
+                 min_dwell=0.0, on_change=None, clock=time.monotonic):
+        self.fusion = fusion
+        self.labels = tuple(fusion.emotion_labels)
+        self.half_life = half_life
+        self.hysteresis = hysteresis
+        self.min_evidence = min_evidence
+        self.min_dwell = min_dwell
+        self.on_change = on_change
+        self.clock = clock
+        self.evidence = np.zeros(len(self.labels))
+        self.weight = 0.0
+        self.updated_at = None
+        self.dominant = None
+        self.dominant_since = None
+        self.observations = 0
+        self.changes = []
+        self._lock = threading.Lock()
+
+    def _decay(self, dt):
+        return 0.5 ** (dt / self.half_life)
+
+    def _project(self, probs):
+        source = tuple(probs)
+        vector = np.fromiter(probs.values(), dtype=np.float64, count=len(source))
+        return normalize_rows(vector @ label_table(source, self.labels))
+
+    def seed(self, probs, weight, timestamp=None):
+        """
+        Start from an already detected emotion: replaces the state with
+        probs at an explicit evidence weight and makes its top emotion
+        dominant, so later observations have to outweigh it to change it
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        vector = self._project(probs)
+        with self._lock:
+            self.evidence = weight * vector
+            self.weight = float(weight)
+            self.updated_at = timestamp
+            self.dominant = int(np.argmax(vector))
+            self.dominant_since = timestamp
+            self.observations = 1
+
+    def observe(self, modality, probs, timestamp=None, confidence=None):
+        """Add one observation, returns a change event dict or None"""
+        if not probs:
+            return None
+        if timestamp is None:
+            timestamp = self.clock()
+        vector = self._project(probs)
+        if confidence is None:
+            confidence = max(probs.values())
+        if self.fusion.fusion_method == 'attention':
+            weight = confidence
+        else:
+            weight = self.fusion.weights.get(modality, 1.0)
+
+        with self._lock:
+            if self.updated_at is None:
+                self.updated_at = timestamp
+            if timestamp >= self.updated_at:
+                decay = self._decay(timestamp - self.updated_at)
+                self.evidence *= decay
+                self.weight *= decay
+                self.updated_at = timestamp
+            else:
+                # Late observation: decay it to the current state time instead
+                weight *= self._decay(self.updated_at - timestamp)
+            self.evidence += weight * vector
+            self.weight += weight
+            self.observations += 1
+            event = self._check_change(timestamp)
+        if event is not None and self.on_change is not None:
+            self.on_change(event)
+        return event
+
+    def _posterior(self):
+        if self.weight <= 0:
+            return np.full(len(self.labels), 1.0 / len(self.labels))
+        return self.evidence / self.weight
+
+    def _check_change(self, timestamp):
+        if self.weight < self.min_evidence:
+            return None
+        posterior = self._posterior()
+        best = int(np.argmax(posterior))
+        if self.dominant is None:
+            self.dominant = best
+            self.dominant_since = timestamp
+            return None
+        if best == self.dominant or posterior[best] - posterior[self.dominant] < self.hysteresis:
+            return None
+        if timestamp - self.dominant_since < self.min_dwell:
+            return None
+        event = {
+            'time': timestamp,
+            'previous': self.labels[self.dominant],
+            'emotion': self.labels[best],
+            'confidence': float(posterior[best]),
+            'probs': dict(zip(self.labels, posterior.tolist()))
+        }
+        self.dominant = best
+        self.dominant_since = timestamp
+        self.changes.append(event)
+        return event
+
+    def current(self):
+        """Fused distribution right now"""
+        with self._lock:
+            return dict(zip(self.labels, self._posterior().tolist()))
+
+    def evidence_weight(self, timestamp=None):
+        """Decayed weight of all observations as of timestamp (default: now)"""
+        with self._lock:
+            if self.updated_at is None:
+                return 0.0
+            if timestamp is None:
+                timestamp = self.clock()
+            return self.weight * self._decay(max(0.0, timestamp - self.updated_at))
+
+    def dominant_emotion(self):
+        """(emotion, confidence) of the current posterior"""
+        probs = self.current()
+        emotion = max(probs, key=probs.get)
+        return emotion, probs[emotion]
+
+    def reset(self):
+        with self._lock:
+            self.evidence[:] = 0.0
+            self.weight = 0.0
+            self.updated_at = None
+            self.dominant = None
+            self.dominant_since = None